@@ -1,33 +1,90 @@
+import asyncio
 import os
-import torch
+import random
+import threading
+import time
 import re
 import json
-import requests
-from ibm_watsonx_ai.foundation_models import ModelInference
-from ibm_watsonx_ai.credentials import Credentials
-from ibm_watsonx_ai import APIClient
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from collections import defaultdict, Counter
 from dotenv import dotenv_values
+import base64
+import hmac
 import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+from decimal import Decimal
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Body
-from typing import List
+from typing import List, Optional
+from .util.granite_utils import score_risk_batch
+from .popup_events import PopupEventHub
+from .risk_screen import RiskScreen
+from .twitter_client import FakeTwitterSession, TwitterClient, TwitterRateLimited
 
 router = APIRouter()
 
 
-popup_state = {
-    "show_popup": False,
-    "support_message": None,
-    "last_checked": None
-}
+DEFAULT_USERNAME = "GauthamSalian31"
+
+# Opted-in users are checked once per interval, spread evenly across it
+MONITORED_USERS = [
+    u.strip() for u in os.getenv("MONITORED_TWITTER_USERS", DEFAULT_USERNAME).split(",") if u.strip()
+]
+RISK_CHECK_INTERVAL_MINUTES = int(os.getenv("RISK_CHECK_INTERVAL_MINUTES", "17"))
+RISK_CHECK_WORKERS = int(os.getenv("RISK_CHECK_WORKERS", "8"))
+RISK_CHECK_JITTER_SECONDS = int(os.getenv("RISK_CHECK_JITTER_SECONDS", "30"))
+
+# Latest risk popup per monitored user
+popup_states = {}
+popup_states_lock = threading.Lock()
+
+def get_popup_state(username):
+    with popup_states_lock:
+        return popup_states.setdefault(username, {
+            "show_popup": False,
+            "support_message": None,
+            "last_checked": None
+        })
+
+def popup_payload(username):
+    popup_state = get_popup_state(username)
+    return {
+        "show_popup": popup_state["show_popup"],
+        "support_message": popup_state["support_message"],
+        "last_checked": popup_state["last_checked"],
+        "risky_tweet_text": popup_state.get("risky_tweet_text")  # 👈 Now accessible to frontend
+    }
+
+# Popup changes are pushed to /api/risk_events subscribers as they happen
+popup_events = PopupEventHub()
+RISK_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("RISK_EVENTS_HEARTBEAT_SECONDS", "15"))
 
 dynamodb = boto3.resource('dynamodb', region_name='ap-south-1')
-scheduler =BackgroundScheduler()
-print("📅 Starting APScheduler...")  # <-- Add this
+# A bounded worker pool runs the checks. A user whose previous check is still
+# running is skipped, and late runs are coalesced instead of piling up.
+scheduler = BackgroundScheduler(
+    executors={"default": ThreadPoolExecutor(RISK_CHECK_WORKERS)},
+    job_defaults={
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": RISK_CHECK_INTERVAL_MINUTES * 30,
+    }
+)
+scheduler_stats = {"skipped_overlaps": 0, "missed_runs": 0}
+
+def record_backpressure(event):
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        scheduler_stats["skipped_overlaps"] += 1
+    else:
+        scheduler_stats["missed_runs"] += 1
+    print(f"⚠️ Risk check backpressure on {event.job_id}: {'still running' if event.code == EVENT_JOB_MAX_INSTANCES else 'missed'}")
+
+scheduler.add_listener(record_backpressure, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
 
 # Step 1: Load env values from file
 env_vars = dotenv_values(r"C:\Users\ASUS\Desktop\MoodMate\Moodmate\backend\.env")
@@ -40,23 +97,52 @@ for key, value in env_vars.items():
 BEARER_TOKEN = os.getenv("TWITTER_BEARER_TOKEN")
 print("BEARER_TOKEN:", "Loaded" if BEARER_TOKEN else "Missing or Empty")
 
+# TWITTER_FAKE_DATA points at a JSON file {"users": {...}, "tweets": {...}} to run without the real API
+TWITTER_FAKE_DATA = os.getenv("TWITTER_FAKE_DATA")
+if TWITTER_FAKE_DATA:
+    with open(TWITTER_FAKE_DATA, encoding="utf-8") as f:
+        fake_data = json.load(f)
+    twitter_client = TwitterClient(
+        BEARER_TOKEN or "fake",
+        session=FakeTwitterSession(fake_data.get("users"), fake_data.get("tweets")),
+    )
+    print("🧪 Using fake Twitter API data from", TWITTER_FAKE_DATA)
+else:
+    twitter_client = TwitterClient(
+        BEARER_TOKEN,
+        timeout=(float(os.getenv("TWITTER_CONNECT_TIMEOUT", "3.05")), float(os.getenv("TWITTER_READ_TIMEOUT", "10"))),
+        pool_size=RISK_CHECK_WORKERS,
+        user_id_ttl=float(os.getenv("TWITTER_USER_ID_TTL_SECONDS", str(24 * 3600))),
+        max_wait=float(os.getenv("TWITTER_RATE_LIMIT_MAX_WAIT", "30")),
+    )
+
 
 
 safe_token = "No"
 risky_token = "Yes"
 
-credentials = Credentials(
-    url="https://eu-de.ml.cloud.ibm.com",  # or regional Watsonx URL
-    api_key=os.getenv("WATSONX_API_KEY")
-)
-client = APIClient(credentials)
-
-guardian_model = ModelInference(
-    model_id="ibm/granite-3-3-8b-instruct",  # ⚠️ A supported model with long-term viability
-    credentials=credentials,
-    project_id="1cb8c38f-d650-41fe-9836-86659006c090",
-    params={"decoding_method": "greedy", "max_new_tokens": 100}
-)
+# Built on first use so importing this module stays cheap and makes no network calls
+_guardian_model = None
+_guardian_model_lock = threading.Lock()
+
+def get_guardian_model():
+    global _guardian_model
+    with _guardian_model_lock:
+        if _guardian_model is None:
+            from ibm_watsonx_ai.credentials import Credentials
+            from ibm_watsonx_ai.foundation_models import ModelInference
+
+            credentials = Credentials(
+                url="https://eu-de.ml.cloud.ibm.com",  # or regional Watsonx URL
+                api_key=os.getenv("WATSONX_API_KEY")
+            )
+            _guardian_model = ModelInference(
+                model_id="ibm/granite-3-3-8b-instruct",  # ⚠️ A supported model with long-term viability
+                credentials=credentials,
+                project_id="1cb8c38f-d650-41fe-9836-86659006c090",
+                params={"decoding_method": "greedy", "max_new_tokens": 100}
+            )
+        return _guardian_model
 
 app = FastAPI()
 app.include_router(router)
@@ -80,209 +166,518 @@ def send_supportive_message(tweet_text):
     </supportive_response>
     """
 
-    response = guardian_model.generate(support_prompt)
+    response = get_guardian_model().generate(support_prompt)
     full_text = response['results'][0]['generated_text']
     support_msg = re.search(r"<response>(.*?)</response>", full_text, re.DOTALL)
 
     return support_msg.group(1).strip() if support_msg else "Just wanted to say I'm here if you need someone to talk to."
 
 
+# Newest tweet id already processed per username, so each poll only sees new tweets.
+# Table: partition key username (S); attributes newest_id (S), updated_at (S).
+# It is optional: without it (or on any error) each poll reads the latest tweets as before.
+POLL_CURSOR_TABLE = os.getenv("POLL_CURSOR_TABLE", "TweetPollCursors")
+
+def load_poll_cursor(username):
+    try:
+        item = dynamodb.Table(POLL_CURSOR_TABLE).get_item(Key={"username": username}).get("Item")
+    except Exception as e:
+        print(f"⚠️ Could not read poll cursor for {username}, reading latest tweets:", str(e))
+        return None
+    return item.get("newest_id") if item else None
+
+def save_poll_cursor(username, newest_id):
+    try:
+        dynamodb.Table(POLL_CURSOR_TABLE).put_item(Item={
+            "username": username,
+            "newest_id": newest_id,
+            "updated_at": datetime.utcnow().isoformat()
+        })
+    except Exception as e:
+        print(f"⚠️ Could not save poll cursor for {username}:", str(e))
+
+def clear_expired_popup(popup_state, cutoff):
+    risky_at = popup_state.get("risky_tweet_created_at")
+    if risky_at is None or risky_at < cutoff:
+        popup_state["show_popup"] = False
+        popup_state["support_message"] = None
+        popup_state["risky_tweet_text"] = None
+        popup_state["risky_tweet_created_at"] = None
+
+
 def scheduled_check(username):
     print(f"⏰ scheduled_check triggered at {datetime.utcnow()} for user: {username}")
+    popup_state = get_popup_state(username)
+    was_shown, alerted = popup_state["show_popup"], False
     try:
         user_id = get_user_id(username)
-        tweets = get_user_tweets(user_id, max_results=10)
+        since_id = load_poll_cursor(username)
+        tweets = get_user_tweets(user_id, max_results=10, since_id=since_id)
 
         now = datetime.utcnow()
         cutoff = now - timedelta(hours=24)
+        popup_state["last_checked"] = now
 
-        for tweet in tweets:
+        if not tweets:
+            # Nothing new since the last poll; an earlier alert stays up for 24h
+            clear_expired_popup(popup_state, cutoff)
+            return
+
+        existing = fetch_existing_analyses([tweet["id"] for tweet in tweets])
+        recent = []
+        for tweet in tweets:  # newest first
             created_at_str = tweet.get("created_at")
             if not created_at_str:
                 continue
 
             created_at = datetime.strptime(created_at_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-            if created_at < cutoff:
-                continue
+            if created_at >= cutoff:
+                recent.append((tweet, created_at))
 
-            result = analyze_tweet(tweet['id'], tweet['text'], created_at_str)
+        # Everything not analyzed before goes to Granite in one batched call
+        misses = [(tweet['id'], tweet['text'], tweet['created_at']) for tweet, _ in recent if str(tweet['id']) not in existing]
+        scored = dict(zip((tweet_id for tweet_id, _, _ in misses), score_tweets(misses, user_id=username))) if misses else {}
 
-            if result['probability_of_risk'] > 0.85:
-                popup_state["show_popup"] = True
-                popup_state["support_message"] = send_supportive_message(result["text"])
-                popup_state["last_checked"] = now
-                popup_state["risky_tweet_text"] = result["text"]
-                return  # We found one, no need to check more
-
-        # If loop ends without finding one
-        popup_state["show_popup"] = False
-        popup_state["support_message"] = None
-        popup_state["last_checked"] = now
-        popup_state["risky_tweet_text"] = None  # 🔐 Preserve the tweet text
+        risky = None
+        for tweet, created_at in recent:
+            if str(tweet['id']) in existing:
+                result = analysis_from_item(existing[str(tweet['id'])])
+            else:
+                result = scored[tweet['id']]
 
+            if result['probability_of_risk'] > 0.85:
+                risky = (result, created_at)
+                break
+
+        if risky:
+            result, created_at = risky
+            popup_state["show_popup"] = True
+            popup_state["support_message"] = send_supportive_message(result["text"])
+            popup_state["risky_tweet_text"] = result["text"]
+            popup_state["risky_tweet_created_at"] = created_at
+            alerted = True
+        else:
+            clear_expired_popup(popup_state, cutoff)
+
+        # Tweets whose scoring failed were not stored; keep the cursor below the oldest one so the next poll retries it
+        failed = [int(tweet_id) for tweet_id, result in scored.items() if result["risk_detected"] == "Unknown"]
+        done = [int(tweet["id"]) for tweet in tweets if not failed or int(tweet["id"]) < min(failed)]
+        if done:
+            save_poll_cursor(username, str(max(done)))
+
+    except TwitterRateLimited as e:
+        # Out of Twitter budget: keep the current popup and cursor, the next run picks up from here
+        print(f"⏳ Skipping risk check for {username}:", str(e))
     except Exception as e:
         print("Scheduler error:", str(e))
         popup_state["show_popup"] = False
+    finally:
+        if alerted:
+            popup_events.publish(username, "risk_popup", popup_payload(username))
+        elif was_shown and not popup_state["show_popup"]:
+            popup_events.publish(username, "popup_cleared", popup_payload(username))
 
 
 def get_user_id(username):
-    url = f"https://api.twitter.com/2/users/by/username/{username}"
-    headers = {"Authorization": f"Bearer {BEARER_TOKEN}"}
-    response = requests.get(url, headers=headers)
-    resp_json = response.json()
-    if "data" in resp_json:
-        return resp_json["data"]["id"]
-    else:
-        raise Exception(f"User not found or API error: {resp_json}")
+    return twitter_client.get_user_id(username)
 
-def store_analysis(tweet_id, text, created_at, harm, confidence, comment):
+def store_analysis(tweet_id, text, created_at, harm, confidence, comment, user_id=None, risk_score=None, screen_version=None):
     table = dynamodb.Table('TweetRiskAnalysis')
 
-    existing_item = table.get_item(Key={'tweet_id': tweet_id})
-    if 'Item' in existing_item:
-        print(f"⚠️ Tweet {tweet_id} already exists in DB. Skipping.")
-        return {"status": "skipped", "reason": "already exists"}
-    
-    response = table.put_item(Item={
+    item = {
         'tweet_id': tweet_id,
         'text': text,
         'created_at': created_at,
         'risk_detected': harm,
         'confidence_score': confidence,
         'explanation': comment
-    })
+    }
+    # user_id + created_at feed USER_ANALYSIS_INDEX; risk_score is numeric for filtering
+    if user_id:
+        item['user_id'] = user_id
+    if risk_score is not None:
+        item['risk_score'] = Decimal(str(risk_score))
+    # Lexicon-only verdicts are provisional: they hold until the screen's threshold or lexicon changes
+    if screen_version:
+        item['screen_only'] = True
+        item['screen_version'] = screen_version
+
+    # One conditional write instead of a get_item followed by put_item; only a stale
+    # screen-only verdict may be overwritten
+    try:
+        response = table.put_item(
+            Item=item,
+            ConditionExpression="attribute_not_exists(tweet_id) OR (screen_only = :yes AND NOT screen_version = :version)",
+            ExpressionAttributeValues={":yes": True, ":version": risk_screen.version}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            print(f"⚠️ Tweet {tweet_id} already exists in DB. Skipping.")
+            return {"status": "skipped", "reason": "already exists"}
+        raise
     return response
 
 
-def get_user_tweets(user_id, max_results=5):
-    url = f"https://api.twitter.com/2/users/{user_id}/tweets"
-    headers = {"Authorization": f"Bearer {BEARER_TOKEN}"}
-    params = {
-        "max_results": max_results,
-        "tweet.fields": "created_at,text",
+BATCH_GET_MAX_RETRIES = 5
+
+def is_current_analysis(item):
+    """Granite verdicts always count; screen-only ones only while the screen is unchanged."""
+    return not item.get("screen_only") or item.get("screen_version") == risk_screen.version
+
+
+def fetch_existing_analyses(tweet_ids):
+    """Look up stored analyses for many tweets with BatchGetItem, 100 keys per call."""
+    ids = list(dict.fromkeys(str(tweet_id) for tweet_id in tweet_ids))
+    found = {}
+    for start in range(0, len(ids), 100):
+        request = {"TweetRiskAnalysis": {"Keys": [{"tweet_id": tweet_id} for tweet_id in ids[start:start + 100]]}}
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get("Responses", {}).get("TweetRiskAnalysis", []):
+                if is_current_analysis(item):
+                    found[item["tweet_id"]] = item
+            request = response.get("UnprocessedKeys") or None
+            if request:
+                # Throttled keys come back unprocessed; retry them with backoff, a few times
+                attempt += 1
+                if attempt > BATCH_GET_MAX_RETRIES:
+                    left = len(request["TweetRiskAnalysis"]["Keys"])
+                    print(f"⚠️ {left} tweet lookup(s) still throttled, treating them as not analyzed")
+                    break
+                time.sleep(min(0.05 * (2 ** attempt), 2.0))
+    return found
+
+
+def analysis_from_item(item):
+    try:
+        probability_of_risk = float(item['confidence_score'])
+    except (KeyError, ValueError):
+        probability_of_risk = 0.0
+    result = {
+        "text": item['text'],
+        "risk_detected": item['risk_detected'],
+        "created_at": item['created_at'],
+        "confidence": item['confidence_score'],
+        "probability_of_risk": probability_of_risk,
+        "explanation": item['explanation'],
+    }
+    if item.get('screen_only'):
+        result["screen_only"] = True
+    return result
+
+
+def unknown_analysis(text, explanation=None):
+    result = {
+        "text": text,
+        "risk_detected": "Unknown",
+        "confidence": "Unknown",
+        "probability_of_risk": 0.0,
     }
-    response = requests.get(url, headers=headers, params=params)
-    resp_json = response.json()
-    print("Response JSON:", json.dumps(resp_json, indent=2))  # Debugging line
-    if "data" in resp_json:
-        return resp_json["data"]
-    else:
-        return []
+    if explanation:
+        result["explanation"] = explanation
+    return result
+
 
-def analyze_tweet(tweet_id, text, created_at: str):
+def get_user_tweets(user_id, max_results=5, since_id=None):
+    return twitter_client.get_user_tweets(user_id, max_results=max_results, since_id=since_id)
+
+def analyze_tweet(tweet_id, text, created_at: str, user_id=None):
     try:
             # 🗃️ Step 1: Check if analysis already exists in DB
             table = dynamodb.Table('TweetRiskAnalysis')
             existing_item = table.get_item(Key={'tweet_id': tweet_id})
-            if 'Item' in existing_item:
+            if 'Item' in existing_item and is_current_analysis(existing_item['Item']):
                 print(f"🔁 Found existing analysis for tweet {tweet_id}")
-                return {
-                    "text": existing_item['Item']['text'],
-                    "risk_detected": existing_item['Item']['risk_detected'],
-                    "created_at": existing_item['Item']['created_at'],
-                    "confidence": existing_item['Item']['confidence_score'],
-                    "probability_of_risk": float(existing_item['Item']['confidence_score']),
-                    "explanation": existing_item['Item']['explanation'],
-                }
+                return analysis_from_item(existing_item['Item'])
     except Exception as e:
         print("🛑 Analyze error:", str(e))
-        return {
-            "text": text,
-            "risk_detected": "Unknown",
-            "confidence": "Unknown",
-            "probability_of_risk": 0.0,
-        }
+        return unknown_analysis(text)
+
+    return score_tweet(tweet_id, text, created_at, user_id=user_id)
+
+
+# Tweets per Granite prompt when scoring a backlog, and prompts sent in parallel
+RISK_BATCH_SIZE = int(os.getenv("RISK_BATCH_SIZE", "8"))
+RISK_BATCH_CONCURRENCY = int(os.getenv("RISK_BATCH_CONCURRENCY", "4"))
+
+# Stage 1 lexicon score a tweet needs before it is sent to Granite (0 sends everything)
+risk_screen = RiskScreen(threshold=float(os.getenv("RISK_SCREEN_THRESHOLD", "0.15")))
+
+def score_tweet(tweet_id, text, created_at: str, user_id=None):
+    """Run the Granite risk check for a tweet with no stored analysis and store the result."""
+    return score_tweets([(tweet_id, text, created_at)], user_id=user_id)[0]
+
 
+def score_tweets(tweets, user_id=None):
+    """Risk-score (tweet_id, text, created_at) tuples and store each result.
+
+    Tweets the lexicon screen clears are stored as provisional (screen_only) low risk,
+    tagged with the screen version; the rest go to Granite in batches.
+    """
+    screen_scores, escalate = risk_screen.screen([text for _, text, _ in tweets])
+    escalated = [tweet for tweet, flag in zip(tweets, escalate) if flag]
     try:
-        prompt = f"""
-            <risk_evaluation>
-            <text>{text}</text>
+        llm_scores = score_risk_batch(
+            get_guardian_model(), [text for _, text, _ in escalated],
+            batch_size=RISK_BATCH_SIZE, concurrency=RISK_BATCH_CONCURRENCY
+        ) if escalated else []
+    except Exception as e:
+        print("🛑 Risk scoring error:", str(e))
+        llm_scores = [None] * len(escalated)
+    llm_scores = iter(llm_scores)
+
+    results = []
+    for (tweet_id, text, created_at), screen_score, flag in zip(tweets, screen_scores, escalate):
+        if flag:
+            parsed = next(llm_scores)
+        else:
+            parsed = {"harm": "No", "confidence": str(screen_score), "comment": "Cleared by the lexicon pre-screen"}
+        if parsed is None:
+            results.append(unknown_analysis(text))
+            continue
+        try:
+            results.append(store_scored_tweet(
+                tweet_id, text, created_at, parsed, user_id, screen_version=None if flag else risk_screen.version
+            ))
+        except Exception as e:
+            print(f"🛑 Could not store analysis for tweet {tweet_id}:", str(e))
+            results.append(unknown_analysis(text))
 
-            Analyze this text for emotional or psychological risk. Respond using structured XML format:
+    risk_screen.record_llm_results([
+        result["probability_of_risk"] for result, flag in zip(results, escalate) if flag
+    ])
+    return results
 
-            <harm>[Yes or No]</harm>
-            <confidence>[Numeric probability between 0.0 (no risk) and 1.0 (high risk)]</confidence>
-            <comment>[Brief reason why the risk was assessed]</comment>
 
-            Your confidence score should directly reflect the probability of risk based on language, tone, and context.
-            </risk_evaluation>
-            """
+def store_scored_tweet(tweet_id, text, created_at, parsed, user_id=None, screen_version=None):
+    label = parsed["harm"] or "Unknown"
+    confidence_str = parsed["confidence"] or "Unknown"
+    explanation = parsed["comment"] or "Not provided"
 
+    try:
+        probability_of_risk = float(confidence_str)
+    except ValueError:
+        probability_of_risk = 0.0
+    tweet_id = str(tweet_id) if tweet_id else "unknown_id"
+    store_analysis(tweet_id, text, created_at, label, confidence_str, explanation,
+                   user_id=user_id, risk_score=probability_of_risk, screen_version=screen_version)
+
+    result = {
+        "text": text,
+        "risk_detected": label,
+        "confidence": confidence_str,
+        "probability_of_risk": probability_of_risk,
+        "explanation": explanation
+    }
+    if screen_version:
+        result["screen_only"] = True
+    return result
+
+
+def schedule_risk_checks(usernames):
+    """Give each user its own interval job, staggered evenly across the interval with jitter."""
+    interval = RISK_CHECK_INTERVAL_MINUTES * 60
+    now = datetime.now()
+    for i, username in enumerate(usernames):
+        add_risk_check(username, now + timedelta(seconds=i * interval / max(1, len(usernames))))
+
+def add_risk_check(username, first_run):
+    scheduler.add_job(
+        scheduled_check,
+        'interval',
+        minutes=RISK_CHECK_INTERVAL_MINUTES,
+        jitter=RISK_CHECK_JITTER_SECONDS,
+        args=[username],
+        id=f"risk_check:{username}",
+        next_run_time=first_run,
+        replace_existing=True
+    )
+
+# Users opted in through /api/monitor, reloaded at startup alongside MONITORED_TWITTER_USERS.
+# Table: partition key username (S); attribute added_at (S).
+MONITORED_USERS_TABLE = os.getenv("MONITORED_USERS_TABLE", "MonitoredTwitterUsers")
+# Shared secret for the /api/monitor endpoints (X-Admin-Token header); unset disables them
+MONITOR_ADMIN_TOKEN = os.getenv("MONITOR_ADMIN_TOKEN")
+
+def load_opted_in_users():
+    try:
+        table = dynamodb.Table(MONITORED_USERS_TABLE)
+        kwargs, usernames = {"ProjectionExpression": "username"}, []
+        while True:
+            response = table.scan(**kwargs)
+            usernames.extend(item["username"] for item in response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return usernames
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    except Exception as e:
+        print("⚠️ Could not load opted-in users, monitoring MONITORED_TWITTER_USERS only:", str(e))
+        return []
 
-        response = guardian_model.generate(prompt)
-        result_text = response['results'][0]['generated_text']
-        print("Generated Text:", result_text)
+def require_monitor_admin(x_admin_token: Optional[str] = Header(None)):
+    if not MONITOR_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Monitoring changes are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, MONITOR_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
-        label_match = re.search(r"<harm>(.*?)</harm>", result_text)
-        confidence_match = re.search(r"<confidence>(.*?)</confidence>", result_text)
-        explanation_match = re.search(r"<comment>(.*?)</comment>", result_text)
+@app.on_event("startup")
+def start_risk_checks():
+    print("📅 Starting APScheduler...")
+    usernames = list(dict.fromkeys(MONITORED_USERS + load_opted_in_users()))
+    schedule_risk_checks(usernames)
+    scheduler.start()
+    print(f"✅ Risk checks scheduled for {len(usernames)} user(s)")
 
-        label = label_match.group(1).strip() if label_match else "Unknown"
-        confidence_str = confidence_match.group(1).strip() if confidence_match else "Unknown"
-        explanation = explanation_match.group(1).strip() if explanation_match else "Not provided"
 
-        try:
-            probability_of_risk = float(confidence_str)
-        except ValueError:
-            probability_of_risk = 0.0
-        tweet_id = str(tweet_id) if tweet_id else "unknown_id"
-        store_analysis(tweet_id, text, created_at, label, confidence_str, explanation)
+@app.on_event("shutdown")
+def stop_risk_checks():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
 
-        return {
-            "text": text,
-            "risk_detected": label,
-            "confidence": confidence_str,
-            "probability_of_risk": probability_of_risk,
-            "explanation": explanation
-        }
 
+@app.post("/api/monitor/{username}", dependencies=[Depends(require_monitor_admin)])
+def monitor_user(username: str):
+    try:
+        dynamodb.Table(MONITORED_USERS_TABLE).put_item(Item={
+            "username": username,
+            "added_at": datetime.utcnow().isoformat()
+        })
     except Exception as e:
-        return {
-            "text": text,
-            "risk_detected": "Unknown",
-            "confidence": "Unknown",
-            "probability_of_risk": 0.0,
-        }
-scheduled_check("GauthamSalian31")
-scheduler.add_job(
-    scheduled_check,
-    'interval',
-    minutes = 17,
-    args=["GauthamSalian31"],
-    id='risk_check_job',
-    replace_existing=True
-)       
-scheduler.start()
-print("✅ Job added to scheduler")
-print("📅 Scheduler jobs:")
-for job in scheduler.get_jobs():
-    print(f"🕒 Job '{job.id}' next run: {job.next_run_time}")
+        print(f"🛑 Could not save monitoring opt-in for {username}:", str(e))
+        raise HTTPException(status_code=503, detail="Could not save the monitoring opt-in")
+    # New users start at a random point in the interval so sign-ups don't bunch up
+    offset = random.uniform(0, RISK_CHECK_INTERVAL_MINUTES * 60)
+    add_risk_check(username, datetime.now() + timedelta(seconds=offset))
+    return {"monitoring": username}
 
 
-@app.get("/api/trigger_check")
-def trigger_check():
+@app.delete("/api/monitor/{username}", dependencies=[Depends(require_monitor_admin)])
+def stop_monitoring_user(username: str):
+    try:
+        dynamodb.Table(MONITORED_USERS_TABLE).delete_item(Key={"username": username})
+    except Exception as e:
+        print(f"🛑 Could not remove monitoring opt-in for {username}:", str(e))
+        raise HTTPException(status_code=503, detail="Could not remove the monitoring opt-in")
+    job = scheduler.get_job(f"risk_check:{username}")
+    if job:
+        job.remove()
+    with popup_states_lock:
+        popup_states.pop(username, None)
+    return {"monitoring": None}
+
+
+@app.get("/api/scheduler_stats")
+def get_scheduler_stats():
     return {
-        "show_popup": popup_state["show_popup"],
-        "support_message": popup_state["support_message"],
-        "last_checked": popup_state["last_checked"],
-        "risky_tweet_text": popup_state.get("risky_tweet_text")  # 👈 Now accessible to frontend
+        "monitored_users": len(scheduler.get_jobs()),
+        "workers": RISK_CHECK_WORKERS,
+        "interval_minutes": RISK_CHECK_INTERVAL_MINUTES,
+        "twitter_rate_limits": twitter_client.budget(),
+        "risk_events": popup_events.stats(),
+        **scheduler_stats
     }
 
 
+@app.get("/api/risk_cascade/stats")
+def get_risk_cascade_stats():
+    return risk_screen.stats()
+
+
+@app.get("/api/trigger_check")
+def trigger_check(username: str = DEFAULT_USERNAME):
+    return popup_payload(username)
+
+
+@app.get("/api/risk_events")
+async def risk_events(request: Request, username: str = DEFAULT_USERNAME, last_event_id: Optional[str] = None):
+    """Server-Sent Events stream of risk_popup / popup_cleared events for one user.
+
+    Reconnecting clients resume after their Last-Event-ID; anyone who can't gets a snapshot first.
+    """
+    resume_from = popup_events.parse_event_id(request.headers.get("last-event-id") or last_event_id)
+    queue, missed = popup_events.subscribe(username, resume_from)
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            for event in missed if missed is not None else [popup_events.snapshot(popup_payload(username))]:
+                yield popup_events.format_sse(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), RISK_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield popup_events.format_sse(event)
+        finally:
+            popup_events.unsubscribe(username, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Granite batches in flight per request, and the budget for each batch (seconds)
+TWEET_ANALYSIS_CONCURRENCY = int(os.getenv("TWEET_ANALYSIS_CONCURRENCY", "8"))
+TWEET_ANALYSIS_TIMEOUT = float(os.getenv("TWEET_ANALYSIS_TIMEOUT", "30"))
+
+async def analyze_tweets_bounded(tweet_data, user_id=None, concurrency=TWEET_ANALYSIS_CONCURRENCY, timeout=TWEET_ANALYSIS_TIMEOUT):
+    """Analyze tweets with at most `concurrency` batches in flight; results keep the input order."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    # Resolve every previously analyzed tweet up front; only misses reach Granite
+    try:
+        existing = await asyncio.to_thread(fetch_existing_analyses, [tweet["id"] for tweet in tweet_data])
+    except Exception as e:
+        print("🛑 Analyze error:", str(e))
+        return [
+            {"date": tweet["date"], "text": tweet["text"], **unknown_analysis(tweet["text"])}
+            for tweet in tweet_data
+        ]
+
+    # Misses are scored RISK_BATCH_SIZE tweets to a Granite prompt
+    misses = [tweet for tweet in tweet_data if str(tweet["id"]) not in existing]
+    chunks = [misses[start:start + RISK_BATCH_SIZE] for start in range(0, len(misses), RISK_BATCH_SIZE)]
+    scored = {}
+
+    async def run_chunk(chunk):
+        async with semaphore:
+            try:
+                results = await asyncio.wait_for(
+                    asyncio.to_thread(score_tweets, [(t["id"], t["text"], t["date"]) for t in chunk], user_id),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                print(f"⏳ Analysis timed out for {len(chunk)} tweet(s)")
+                results = [unknown_analysis(t["text"], "Timed out") for t in chunk]
+        for tweet, result in zip(chunk, results):
+            scored[tweet["id"]] = result
+
+    await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+    return [
+        {
+            "date": tweet["date"],
+            "text": tweet["text"],
+            **(analysis_from_item(existing[str(tweet["id"])]) if str(tweet["id"]) in existing else scored[tweet["id"]])
+        }
+        for tweet in tweet_data
+    ]
+
+
+async def fetch_tweet_data(username: str, max_results: int):
+    user_id = await asyncio.to_thread(get_user_id, username)
+    tweets = await asyncio.to_thread(get_user_tweets, user_id, max_results)
+    return [{"id": tweet["id"], "date": tweet["created_at"], "text": tweet["text"]} for tweet in tweets]
+
+
 @app.get("/analyze_tweets/{username}")
-def analyze_tweets(username: str, max_results: int = 5):
+async def analyze_tweets(username: str, max_results: int = 5):
     try:
-        user_id = get_user_id(username)
-        tweets = get_user_tweets(user_id, max_results=max_results)
-        tweet_data = [{"id": tweet["id"], "date": tweet["created_at"], "text": tweet["text"]} for tweet in tweets]
-        results = []
-        for tweet in tweet_data:
-            result = analyze_tweet(tweet["id"], tweet["text"], tweet["date"])
-            results.append({
-                "date": tweet["date"],
-                "text": tweet["text"],
-                **result
-            })
+        tweet_data = await fetch_tweet_data(username, max_results)
+        results = await analyze_tweets_bounded(tweet_data, user_id=username)
         if not results:
             return {"error": "Try again later"}
         return {"results": results}
@@ -291,22 +686,10 @@ def analyze_tweets(username: str, max_results: int = 5):
     
 
 @app.get("/analyze_all/{username}")
-def analyze_all(username: str, max_results: int = 5):
+async def analyze_all(username: str, max_results: int = 5):
     try:
-        user_id = get_user_id(username)
-        tweets = get_user_tweets(user_id, max_results=max_results)
-
-        tweet_data = [{"id": tweet["id"], "date": tweet["created_at"], "text": tweet["text"]} for tweet in tweets]
-
-        results = []
-        for tweet in tweet_data:
-            result = analyze_tweet(tweet["id"], tweet["text"], tweet["date"])
-            results.append({
-                "date": tweet["date"],
-                "text": tweet["text"],
-                **result
-            })
-
+        tweet_data = await fetch_tweet_data(username, max_results)
+        results = await analyze_tweets_bounded(tweet_data, user_id=username)
 
         return {
             "risk_analysis": results,
@@ -314,31 +697,130 @@ def analyze_all(username: str, max_results: int = 5):
     except Exception as e:
         return {"error": str(e)}
 
+# GSI on TweetRiskAnalysis: partition key user_id, sort key created_at. Items stored
+# before it existed lack user_id/risk_score; fill them in with
+# `python -m backend.backfill_analysis_index --users <username>,...`
+USER_ANALYSIS_INDEX = "user_id-created_at-index"
+
+def encode_page_cursor(last_key):
+    return base64.urlsafe_b64encode(json.dumps(last_key).encode()).decode() if last_key else None
+
+def decode_page_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def analysis_to_result(tweet):
+    try:
+        probability_of_risk = float(tweet.get("risk_score", tweet.get("confidence_score", "0.0")))
+    except ValueError:
+        probability_of_risk = 0.0
+    return {
+        "date": tweet.get("created_at", "Unknown"),
+        "text": tweet.get("text", ""),
+        "risk_detected": tweet.get("risk_detected", "Unknown"),
+        "confidence": tweet.get("confidence_score", "Unknown"),
+        "probability_of_risk": probability_of_risk,
+        "explanation": tweet.get("explanation", "Not provided"),
+        "tweet_id": tweet.get("tweet_id", ""),
+        "screen_only": bool(tweet.get("screen_only", False))
+    }
+
+def iter_analysis_pages(user_id=None, since=None, until=None, min_risk=None, page_size=None, cursor=None):
+    """Yield (results, next_key) pages of stored analyses.
+
+    With a user_id this is a Query on USER_ANALYSIS_INDEX, newest first, so only
+    that user's items are read. Without one it falls back to a paginated scan.
+    """
+    table = dynamodb.Table('TweetRiskAnalysis')
+    kwargs = {}
+    if page_size:
+        kwargs["Limit"] = page_size
+    if cursor:
+        kwargs["ExclusiveStartKey"] = decode_page_cursor(cursor)
+
+    if user_id:
+        condition = Key("user_id").eq(user_id)
+        if since and until:
+            condition = condition & Key("created_at").between(since, until)
+        elif since:
+            condition = condition & Key("created_at").gte(since)
+        elif until:
+            condition = condition & Key("created_at").lte(until)
+        kwargs.update(IndexName=USER_ANALYSIS_INDEX, KeyConditionExpression=condition, ScanIndexForward=False)
+        if min_risk is not None:
+            kwargs["FilterExpression"] = Attr("risk_score").gte(Decimal(str(min_risk)))
+        read_page = table.query
+    else:
+        read_page = table.scan
+
+    while True:
+        response = read_page(**kwargs)
+        results = [analysis_to_result(item) for item in response.get("Items", [])]
+        if not user_id:
+            # Older items only carry the string confidence and have no user/time key
+            results = [
+                r for r in results
+                if (min_risk is None or r["probability_of_risk"] >= min_risk)
+                and (since is None or r["date"] >= since)
+                and (until is None or r["date"] <= until)
+            ]
+        last_key = response.get("LastEvaluatedKey")
+        yield results, last_key
+        if not last_key:
+            return
+        kwargs["ExclusiveStartKey"] = last_key
+
+def resume_key(result, user_id=None):
+    """ExclusiveStartKey that continues right after `result`."""
+    key = {"tweet_id": result["tweet_id"]}
+    if user_id:
+        key.update(user_id=user_id, created_at=result["date"])
+    return key
+
+def stream_analysis(**filters):
+    for results, _ in iter_analysis_pages(**filters):
+        for result in results:
+            yield json.dumps(result) + "\n"
+
 @app.get("/api/read_analysis")
-def read_analyzed_tweets():
+def read_analyzed_tweets(
+    user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    min_risk: Optional[float] = Query(None, ge=0.0, le=1.0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False
+):
+    """Stored analyses, newest first per user. Pass `limit` to page with `next_cursor`,
+    or `stream=true` for NDJSON. Without `limit` every page is read."""
+    filters = {"user_id": user_id, "since": since, "until": until, "min_risk": min_risk, "cursor": cursor}
+    if stream:
+        if cursor:
+            decode_page_cursor(cursor)  # reject a bad cursor before the stream starts
+        return StreamingResponse(stream_analysis(page_size=limit, **filters), media_type="application/x-ndjson")
+
     try:
-        table = dynamodb.Table('TweetRiskAnalysis') 
-        response = table.scan()
-        print(f"🔎 Raw scan response: {response}")
-        items = response.get("Items", [])
-
-        results = []
-        for tweet in items:
-            result = {
-                "date": tweet.get("created_at", "Unknown"),
-                "text": tweet.get("text", ""),
-                "risk_detected": tweet.get("risk_detected", "Unknown"),
-                "confidence": tweet.get("confidence_score", "Unknown"),
-                "probability_of_risk": float(tweet.get("confidence_score", "0.0")),
-                "explanation": tweet.get("explanation", "Not provided"),
-                "tweet_id": tweet.get("tweet_id", "")
-            }
-            results.append(result)
+        # Filters (min_risk, or the scan's date checks) apply after DynamoDB's Limit, so a
+        # page can come back short; keep reading until `limit` results or the end
+        results, next_key = [], None
+        for page, next_key in iter_analysis_pages(page_size=limit, **filters):
+            results.extend(page)
+            if limit and len(results) >= limit:
+                if len(results) > limit:
+                    results = results[:limit]
+                    next_key = resume_key(results[-1], user_id)
+                break
 
         return {
-            "risk_analysis": results
+            "risk_analysis": results,
+            "next_cursor": encode_page_cursor(next_key) if limit else None
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("🛑 Error reading tweet analysis:", str(e))
         return {
@@ -0,0 +1,81 @@
+"""Fill in the attributes /api/read_analysis needs on TweetRiskAnalysis items
+stored before the per-user index existed.
+
+Every item without a numeric risk_score gets one from its confidence_score, and
+each listed user's latest tweets (up to --max-results, at most 100) are tagged
+with their user_id so they show up in user_id-created_at-index. Older tweets of
+a user can't be attributed and stay out of the index. Run from the repository root:
+
+    python -m backend.backfill_analysis_index --users GauthamSalian31
+    python -m backend.backfill_analysis_index --skip-risk-scores --users a,b --max-results 100
+"""
+import argparse
+import sys
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+from .analyzetweets import dynamodb, get_user_id, get_user_tweets
+
+
+def update_if(table, tweet_id, update, values, condition):
+    """Apply one update; False when the item is missing or already filled in."""
+    try:
+        table.update_item(
+            Key={"tweet_id": tweet_id},
+            UpdateExpression=update,
+            ExpressionAttributeValues=values,
+            ConditionExpression=condition
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
+
+
+def backfill_risk_scores(table):
+    kwargs = {"FilterExpression": Attr("risk_score").not_exists()}
+    updated = 0
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get("Items", []):
+            try:
+                risk_score = Decimal(str(float(item.get("confidence_score", "0.0"))))
+            except ValueError:
+                risk_score = Decimal("0.0")
+            updated += update_if(table, item["tweet_id"], "SET risk_score = :score", {":score": risk_score},
+                                 "attribute_exists(tweet_id) AND attribute_not_exists(risk_score)")
+        if "LastEvaluatedKey" not in response:
+            return updated
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def backfill_user_ids(table, username, max_results=100):
+    # Analyses are stored under the username they were requested for
+    tweets = get_user_tweets(get_user_id(username), max_results=max_results)
+    return sum(
+        update_if(table, str(tweet["id"]), "SET user_id = :user", {":user": username},
+                  "attribute_exists(tweet_id) AND attribute_not_exists(user_id)")
+        for tweet in tweets
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="", help="comma-separated usernames whose tweets to attribute")
+    parser.add_argument("--max-results", type=int, default=100, help="latest tweets per user to attribute (5-100)")
+    parser.add_argument("--skip-risk-scores", action="store_true", help="don't fill in missing risk_score values")
+    args = parser.parse_args(argv)
+
+    table = dynamodb.Table("TweetRiskAnalysis")
+    if not args.skip_risk_scores:
+        print(f"🔢 Added risk_score to {backfill_risk_scores(table)} item(s)")
+    for username in [u.strip() for u in args.users.split(",") if u.strip()]:
+        print(f"👤 Tagged {backfill_user_ids(table, username, args.max_results)} item(s) with user_id {username}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Calibrate the lexicon pre-screen that sits in front of Granite risk scoring.
+
+Reads labelled samples (JSON lines with "text" and a boolean "risky") and reports,
+for each threshold, how many risky samples would still reach the LLM (recall) and
+what share of all samples would be escalated. Run from the repository root:
+
+    python -m backend.benchmarks.calibrate_risk_screen --samples labelled.jsonl
+    python -m backend.benchmarks.calibrate_risk_screen --thresholds 0.1 0.15 0.2 --show-misses 0.15
+
+A risky sample containing a CRISIS_PHRASES entry is escalated at any threshold,
+so `sentiment_recall` reports recall over the risky samples without one: that is
+the part the threshold decides. Every miss is a sample the model never sees;
+list them with --show-misses.
+"""
+import argparse
+import json
+import os
+import sys
+
+from backend.risk_screen import CRISIS_RE, RiskScreen
+
+DEFAULT_SAMPLES = os.path.join(os.path.dirname(__file__), "risk_screen_samples.jsonl")
+DEFAULT_THRESHOLDS = [0.05, 0.1, 0.125, 0.15, 0.2, 0.3, 0.4, 0.5]
+
+
+def load_samples(path):
+    with open(path, encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    return [(s["text"], bool(s["risky"])) for s in samples]
+
+
+def calibrate(scores, labels, thresholds, phrase_hits=None):
+    phrase_hits = phrase_hits or [False] * len(scores)
+    n_risky = sum(labels)
+    n_sentiment = sum(1 for risky, hit in zip(labels, phrase_hits) if risky and not hit)
+    rows = []
+    for threshold in thresholds:
+        escalated = [score >= threshold for score in scores]
+        caught = sum(1 for flag, risky in zip(escalated, labels) if flag and risky)
+        caught_by_sentiment = sum(
+            1 for flag, risky, hit in zip(escalated, labels, phrase_hits) if flag and risky and not hit
+        )
+        rows.append({
+            "threshold": threshold,
+            "recall": round(caught / n_risky, 3) if n_risky else None,
+            "sentiment_recall": round(caught_by_sentiment / n_sentiment, 3) if n_sentiment else None,
+            "escalation_rate": round(sum(escalated) / len(scores), 3) if scores else None,
+            "missed": n_risky - caught,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", default=DEFAULT_SAMPLES, help="JSON lines with text and risky fields")
+    parser.add_argument("--thresholds", nargs="*", type=float, default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--show-misses", type=float, help="print the risky samples this threshold lets through")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    samples = load_samples(args.samples)
+    texts, labels = [t for t, _ in samples], [r for _, r in samples]
+    scores = RiskScreen().scores(texts)
+    phrase_hits = [bool(CRISIS_RE.search(text)) for text in texts]
+    print(f"📋 {len(samples)} samples, {sum(labels)} labelled risky, "
+          f"{sum(1 for r, hit in zip(labels, phrase_hits) if r and not hit)} of them without a crisis phrase")
+
+    rows = calibrate(scores, labels, args.thresholds, phrase_hits)
+    for row in rows:
+        print(f"threshold={row['threshold']:<5} recall={row['recall']}  sentiment_recall={row['sentiment_recall']}  "
+              f"escalated={row['escalation_rate']}  missed={row['missed']}")
+
+    if args.show_misses is not None:
+        for text, risky, score in zip(texts, labels, scores):
+            if risky and score < args.show_misses:
+                print(f"❌ missed (score {score}): {text}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"samples": len(samples), "thresholds": rows}, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
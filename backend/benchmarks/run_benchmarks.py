@@ -0,0 +1,246 @@
+"""Offline microbenchmarks for MoodMate's pure-Python hot paths.
+
+Run from the repository root:
+
+    python -m backend.benchmarks.run_benchmarks --output bench.json
+    python -m backend.benchmarks.run_benchmarks --baseline bench.json --fail-on-regression
+
+Every case runs on synthetic inputs at several sizes; no network calls are made.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+from datetime import date, timedelta
+
+# The analytics modules build boto3 resources at import time; that needs a region, not a network
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-south-1")
+
+DEFAULT_SIZES = [10, 100, 1000]
+EMOTIONS = ["joy", "sadness", "anger", "fear", "neutral", "surprise", "disgust"]
+FILLER = "today i went to work and then came home to cook dinner with my family".split()
+
+
+# ---------- Synthetic inputs ----------
+
+def make_journal_item(rng, n_words):
+    return {
+        "id": f"entry-{rng.randrange(10**6)}",
+        "date": "2025-07-20",
+        "dominant_emotion": rng.choice(EMOTIONS),
+        "dominant_score": rng.random(),
+        "stress_score": rng.random(),
+        "all_emotions": [{"emotion": e, "score": rng.random()} for e in EMOTIONS],
+        "word_emotions": [
+            {"text": rng.choice(FILLER), "emotion": rng.choice(EMOTIONS), "score": rng.random()}
+            for _ in range(n_words)
+        ],
+    }
+
+
+def make_granite_output(rng, n_words):
+    comment = " ".join(rng.choice(FILLER) for _ in range(n_words))
+    return (
+        "Here is my assessment.\n"
+        f"<harm>{rng.choice(['Yes', 'No'])}</harm>\n"
+        f"<confidence>{rng.random():.2f}</confidence>\n"
+        f"<comment>{comment}</comment>\n"
+    )
+
+
+def make_granite_batch_output(rng, n_items):
+    return "".join(
+        f'<result id="{i}">{make_granite_output(rng, 12)}</result>\n' for i in range(1, n_items + 1)
+    )
+
+
+def make_journal_entries(rng, n):
+    start = date(2025, 1, 1)
+    # Runs of repeated emotions so streak detection has work to do
+    entries, emotion = [], rng.choice(EMOTIONS)
+    for i in range(n):
+        if rng.random() < 0.3:
+            emotion = rng.choice(EMOTIONS)
+        entries.append({"date": (start + timedelta(days=i)).isoformat(), "dominant_emotion": emotion})
+    return entries
+
+
+def make_chat_messages(rng, n):
+    from backend.chat_memory_analyzer import STRESS_KEYWORDS
+    messages = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(12)]
+        if rng.random() < 0.4:
+            words.insert(rng.randrange(len(words)), rng.choice(STRESS_KEYWORDS))
+        messages.append({"message": " ".join(words)})
+    return messages
+
+
+def make_goal_inputs(rng, n_words):
+    from backend.util.goal_manager import GOAL_PROGRESS_PHRASES
+    phrases = [p for group in GOAL_PROGRESS_PHRASES.values() for p in group]
+    words = [rng.choice(FILLER) for _ in range(n_words)]
+    if rng.random() < 0.5:
+        words.append(rng.choice(phrases))
+    return " ".join(words).lower()
+
+
+# ---------- Cases ----------
+
+def case_journal_convert(rng, size):
+    from backend.util.dynamo_utils import convert_floats_to_decimal
+    item = make_journal_item(rng, size)
+    return lambda: convert_floats_to_decimal(item)
+
+
+def case_transfer_convert(rng, size):
+    from transfer import convert_floats_to_decimal
+    item = make_journal_item(rng, size)
+    return lambda: convert_floats_to_decimal(item)
+
+
+def case_granite_parse(rng, size):
+    from backend.util.granite_utils import parse_risk_xml
+    outputs = [make_granite_output(rng, size) for _ in range(20)]
+    return lambda: [parse_risk_xml(o) for o in outputs]
+
+
+def case_granite_batch_parse(rng, size):
+    from backend.util.granite_utils import parse_batch_risk_xml
+    output = make_granite_batch_output(rng, size)
+    return lambda: parse_batch_risk_xml(output, size)
+
+
+def case_retrieval_search(rng, size):
+    import tempfile
+    from backend.retrieval import CORPUS_PATH, LocalRetriever, build_index, load_corpus
+    index_path = os.path.join(tempfile.mkdtemp(), "bench_index.bin")
+    retriever = LocalRetriever(build_index(load_corpus(CORPUS_PATH), index_path))
+    query = " ".join(rng.choice(FILLER + ["stressed", "sleep", "anxious", "lonely", "exams"]) for _ in range(size))
+    return lambda: retriever.search(query, 3)
+
+
+def case_emotion_streaks(rng, size):
+    from backend.memory_processor import detect_emotion_streaks
+    entries = make_journal_entries(rng, size)
+    return lambda: detect_emotion_streaks(entries)
+
+
+def case_summarize_emotions(rng, size):
+    from backend.memory_processor import summarize_emotions
+    entries = make_journal_entries(rng, size)
+    return lambda: summarize_emotions(entries)
+
+
+def case_stress_mentions(rng, size):
+    from backend.chat_memory_analyzer import detect_stress_mentions
+    messages = make_chat_messages(rng, size)
+    return lambda: detect_stress_mentions(messages)
+
+
+def case_goal_keywords(rng, size):
+    from backend.util.goal_manager import GOAL_PROGRESS_PHRASES, mentions_goal_progress
+    inputs = [make_goal_inputs(rng, size) for _ in range(20)]
+    goal_types = list(GOAL_PROGRESS_PHRASES)
+    return lambda: [mentions_goal_progress(g, text) for text in inputs for g in goal_types]
+
+
+CASES = {
+    "journal.convert_floats_to_decimal": case_journal_convert,
+    "transfer.convert_floats_to_decimal": case_transfer_convert,
+    "granite.parse_risk_xml": case_granite_parse,
+    "granite.parse_batch_risk_xml": case_granite_batch_parse,
+    "retrieval.search": case_retrieval_search,
+    "memory_processor.detect_emotion_streaks": case_emotion_streaks,
+    "memory_processor.summarize_emotions": case_summarize_emotions,
+    "chat_memory_analyzer.detect_stress_mentions": case_stress_mentions,
+    "goal_manager.keyword_matching": case_goal_keywords,
+}
+
+
+# ---------- Harness ----------
+
+def time_callable(fn, repeat):
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    samples = [t / loops for t in timer.repeat(repeat=repeat, number=loops)]
+    return {"loops": loops, "min_s": min(samples), "median_s": statistics.median(samples)}
+
+
+def run(selected, sizes, repeat, seed):
+    results = []
+    for name in selected:
+        for size in sizes:
+            fn = CASES[name](random.Random(seed), size)
+            timing = time_callable(fn, repeat)
+            results.append({"name": name, "size": size, **timing})
+            print(f"{name:<45} size={size:<6} median={timing['median_s'] * 1e6:12.2f} µs")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Return the cases whose best time got slower than the baseline by more than `tolerance`.
+
+    The minimum is compared rather than the median because it is the least noisy.
+    """
+    previous = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        before = previous.get((r["name"], r["size"]))
+        if not before:
+            continue
+        ratio = r["min_s"] / before["min_s"]
+        marker = "⚠️ " if ratio > 1 + tolerance else "  "
+        print(f"{marker}{r['name']:<45} size={r['size']:<6} x{ratio:.2f} vs baseline")
+        if ratio > 1 + tolerance:
+            regressions.append({"name": r["name"], "size": r["size"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="*", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against a previously saved results file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown ratio before flagging (0.2 = 20%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    current = run(args.cases, args.sizes, args.repeat, args.seed)
+
+    # Compare first so the saved results carry the regressions too
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        current["regressions"] = regressions
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    if regressions and args.fail_on_regression:
+        print(f"❌ {len(regressions)} benchmark regression(s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,14 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import httpx, os, difflib
+import asyncio, httpx, json, os, difflib, threading
 from dotenv import load_dotenv
-import boto3
 from uuid import uuid4
 from datetime import datetime
+from .repositories import get_repositories
+from .retrieval import format_passages, get_retriever
+from .chatmemory_utils import assemble_context, record_turn
 
 load_dotenv()
 app = FastAPI()
@@ -19,9 +22,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# DynamoDB setup
-dynamodb = boto3.resource("dynamodb", region_name="ap-south-1")
-emotion_table = dynamodb.Table("UserEmotionLogs")  # Optional table for emotion history
+# One pooled client to the RAG server for the app's lifetime, so messages reuse warm connections
+RAG_QUERY_URL = os.getenv("RAG_QUERY_URL", "http://13.127.84.121:8000/query")
+RAG_TIMEOUT = httpx.Timeout(
+    float(os.getenv("RAG_READ_TIMEOUT", "60")),
+    connect=float(os.getenv("RAG_CONNECT_TIMEOUT", "5"))
+)
+RAG_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("RAG_MAX_CONNECTIONS", "50")),
+    max_keepalive_connections=int(os.getenv("RAG_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0
+)
+rag_client = None
+
+# "remote" sends prompts to the RAG server; "local" retrieves coping passages in process and
+# asks an OpenAI-compatible chat endpoint (OpenRouter by default), or answers offline without a key
+RAG_BACKEND = os.getenv("RAG_BACKEND", "remote")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+CHAT_LLM_URL = os.getenv("CHAT_LLM_URL", "https://openrouter.ai/api/v1/chat/completions")
+CHAT_LLM_MODEL = os.getenv("CHAT_LLM_MODEL", "mistral:instruct")
+CHAT_LLM_API_KEY = os.getenv("CHAT_LLM_API_KEY") or os.getenv("VITE_OPENROUTER_API_KEY")
+
+def http2_available():
+    try:
+        import h2  # noqa: F401  (httpx needs it for http2=True)
+        return True
+    except ImportError:
+        return False
+
+@app.on_event("startup")
+async def open_rag_client():
+    global rag_client
+    rag_client = httpx.AsyncClient(http2=http2_available(), timeout=RAG_TIMEOUT, limits=RAG_LIMITS)
+    if RAG_BACKEND == "local":
+        # Build (if stale) and memory-map the retrieval index before the first message
+        await asyncio.to_thread(get_retriever)
+
+@app.on_event("shutdown")
+async def close_rag_client():
+    if rag_client is not None:
+        await rag_client.aclose()
+
+RAG_UNAVAILABLE_REPLY = "😔 I’m having trouble reaching the support system right now, but I’m still here for you. Want to try a simple breathing exercise together?"
+INTERNAL_ERROR_REPLY = "🚨 Internal server error. You're not alone—I’m still right here. Let’s take it slow. Want a grounding tip?"
+
+# Off by default: when on, turns are saved to ChatMemory and earlier ones are folded
+# into the prompt, newest first, within CHAT_HISTORY_TOKENS tokens
+CHAT_HISTORY_ENABLED = os.getenv("CHAT_HISTORY_ENABLED", "false").lower() == "true"
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "600"))
+
+# DynamoDB access goes through the async repositories (UserEmotionLogs, HabitFlowProgress, ...)
+repos = get_repositories()
 
 # Base prompt
 BASE_PROMPT = """
@@ -38,26 +89,31 @@ class Message(BaseModel):
     emotion: str = None
     stress: float = None
     risky_tweet: bool = False
+    stream: bool = False  # reply as Server-Sent Events (token, then done) instead of one JSON body
 
-def get_uncompleted_habits_today(user_id: str):
+# Users already reminded today; the reminder goes out once per user per day
+reminded_today = {"day": None, "users": set()}
+reminded_lock = threading.Lock()
+
+async def get_uncompleted_habits_today(user_id: str):
     today = datetime.utcnow().date().isoformat()
-    habit_table = dynamodb.Table("HabitFlowProgress")
-    pending_habits = []
-
-    response = habit_table.scan()
-    for item in response.get("Items", []):
-        if item.get("user_id") == user_id and item.get("is_active", False):
-            last_completed = item.get("last_completed", "")
-            if last_completed != today:
-                pending_habits.append(item)
-
-                # Update last_completed so we don’t remind again today
-                habit_table.update_item(
-                    Key={"user_id": item["user_id"], "habit_id": item["habit_id"]},
-                    UpdateExpression="SET last_completed = :today",
-                    ExpressionAttributeValues={":today": today}
-                )
+    with reminded_lock:
+        if reminded_today["day"] != today:
+            reminded_today["day"], reminded_today["users"] = today, set()
+        if user_id in reminded_today["users"]:
+            return []
+
+    # Only this user's partition, instead of scanning every user's habits
+    pending_habits = await repos.habits.pending_today(user_id, today)
+
+    # Update last_completed so we don’t remind again today, in one transaction per 100 habits
+    await repos.habits.mark_completed(pending_habits, today)
 
+    # Only a reminder actually sent counts; a habit added later today still gets one
+    if pending_habits:
+        with reminded_lock:
+            if reminded_today["day"] == today:
+                reminded_today["users"].add(user_id)
     return pending_habits
 
 # Main chat route
@@ -74,17 +130,16 @@ async def chat(message: Message, request: Request):
 
     # ✅ Emotion log (optional)
     if emotion or stress is not None:
-        emotion_table.put_item(Item={
-            "user_id": user_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "emotion": emotion or "unknown",
-            "stress": stress or 0.5,
-            "message": user_input
-        })
+        await repos.emotion_logs.log(user_id, emotion or "unknown", stress or 0.5, user_input)
+
+    # 🗂️ Conversation so far (served from the in-process cache after the first turn), then this turn
+    history = await assemble_context(user_id, CHAT_HISTORY_TOKENS) if CHAT_HISTORY_ENABLED else ""
+    if user_input:
+        await save_turn(user_id, "user", user_input)
 
     # ✅ Habit encouragement flow (when not triggered by risky tweet)
     if not risky_tweet_text:
-        pending_habits = get_uncompleted_habits_today(user_id)
+        pending_habits = await get_uncompleted_habits_today(user_id)
         if pending_habits:
             habit_names = [h["habit_name"] for h in pending_habits]
             habit_list = ", ".join(habit_names)
@@ -92,7 +147,7 @@ async def chat(message: Message, request: Request):
                 f"🌱 Just a gentle reminder — don't forget your healthy habits today: {habit_list}. "
                 f"You’re doing great, keep going! 💪"
             )
-            return {"response": encouragement}
+            return await reply_response(encouragement, message.stream, user_id)
 
     # 🧠 Tone scaffolding
     emotion_context = ""
@@ -110,25 +165,140 @@ async def chat(message: Message, request: Request):
     elif emotion in ["sad", "angry", "fearful"]:
         emotion_context += f"The user feels {emotion}. Be affirming and avoid advice overload.\n"
 
-    full_prompt = f"{BASE_PROMPT.strip()}\n\n{emotion_context}User: {user_input or risky_tweet_text}"
+    # 📚 Local retrieval: fold the best matching coping passages into the prompt
+    knowledge, passages = "", []
+    if RAG_BACKEND == "local":
+        passages = get_retriever().search(user_input, RAG_TOP_K)
+        if passages:
+            knowledge = f"Helpful background (use only if relevant):\n{format_passages(passages)}\n\n"
+        if not CHAT_LLM_API_KEY:
+            return await reply_response(offline_reply(passages), message.stream, user_id)
+
+    conversation = f"Conversation so far:\n{history}\n\n" if history else ""
+    full_prompt = f"{BASE_PROMPT.strip()}\n\n{emotion_context}{knowledge}{conversation}User: {user_input or risky_tweet_text}"
+    url, payload, headers = upstream_request(full_prompt, message.stream)
 
-    # 💬 Make request to RAG server
+    if message.stream:
+        return StreamingResponse(
+            stream_rag_reply(url, payload, headers, user_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    # 💬 Make request to RAG server (or the chat model in local mode)
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post("http://13.127.84.121:8000/query", json={"query": full_prompt}, timeout=60.0)
-            if response.status_code != 200:
-                print("❌ AWS RAG Error:", response.text)
-                return {
-                    "response": "😔 I’m having trouble reaching the support system right now, but I’m still here for you. Want to try a simple breathing exercise together?"
-                }
-            data = response.json()
-            reply = data.get("answer") or data.get("response") or "🤖 No valid response generated."
-            return {"response": reply.strip()}
+        response = await rag_client.post(url, json=payload, headers=headers)
+        if response.status_code != 200:
+            print("❌ AWS RAG Error:", response.text)
+            return {"response": RAG_UNAVAILABLE_REPLY}
+        reply = extract_reply(response.json())
+        await save_turn(user_id, "assistant", reply)
+        return {"response": reply}
     except Exception as e:
         import traceback
         print("🔥 Exception in /chat:", str(e))
         traceback.print_exc()
-        return {
-            "response": "🚨 Internal server error. You're not alone—I’m still right here. Let’s take it slow. Want a grounding tip?"
-        }
+        return {"response": INTERNAL_ERROR_REPLY}
+
+
+async def save_turn(user_id: str, role: str, content: str):
+    if CHAT_HISTORY_ENABLED:
+        await record_turn(user_id, role, content)
 
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def reply_response(text: str, stream: bool, user_id: str):
+    await save_turn(user_id, "assistant", text)
+    if not stream:
+        return {"response": text}
+
+    async def single_reply():
+        yield sse_event("token", {"text": text})
+        yield sse_event("done", {})
+    return StreamingResponse(single_reply(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def upstream_request(full_prompt: str, stream: bool):
+    if RAG_BACKEND != "local":
+        return RAG_QUERY_URL, {"query": full_prompt, **({"stream": True} if stream else {})}, {}
+    payload = {
+        "model": CHAT_LLM_MODEL,
+        "messages": [{"role": "user", "content": full_prompt}],
+        "temperature": 0.7,
+        "stream": stream
+    }
+    headers = {
+        "Authorization": f"Bearer {CHAT_LLM_API_KEY}",
+        "HTTP-Referer": "http://localhost:5173",
+        "X-Title": "MoodMate Lumi"
+    }
+    return CHAT_LLM_URL, payload, headers
+
+
+def offline_reply(passages) -> str:
+    if not passages:
+        return "💙 I’m here with you. Want to try a slow breath together — in for four, out for six?"
+    best = passages[0]
+    return f"💙 I’m here with you. Something that might help — {best['title']}: {best['text']}"
+
+
+def extract_reply(data: dict) -> str:
+    if data.get("choices"):
+        reply = data["choices"][0].get("message", {}).get("content")
+    else:
+        reply = data.get("answer") or data.get("response")
+    return (reply or "🤖 No valid response generated.").strip()
+
+
+def token_text(data: str) -> str:
+    # Upstream chunks may be OpenAI-style deltas, JSON ({"token": ...}) or bare text
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return data
+    if not isinstance(chunk, dict):
+        return data  # a text token that happens to parse as JSON ("true", " 2") is still text
+    if chunk.get("choices"):
+        return chunk["choices"][0].get("delta", {}).get("content") or ""
+    return chunk.get("token") or chunk.get("text") or chunk.get("answer") or chunk.get("response") or ""
+
+
+async def stream_rag_reply(url: str, payload: dict, headers: dict, user_id: str):
+    """Forward the upstream reply as token events as it arrives.
+
+    An upstream that answers with plain JSON instead of a stream becomes a single token event.
+    The full reply is saved as the assistant turn once the stream ends.
+    """
+    parts = []
+    try:
+        async with rag_client.stream("POST", url, json=payload, headers=headers) as response:
+            if response.status_code != 200:
+                print("❌ AWS RAG Error:", (await response.aread()).decode(errors="replace"))
+                yield sse_event("token", {"text": RAG_UNAVAILABLE_REPLY})
+            elif response.headers.get("content-type", "").startswith("text/event-stream"):
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    # SSE drops only the one optional space after "data:"; tokens keep their own spacing
+                    data = line[5:]
+                    if data.startswith(" "):
+                        data = data[1:]
+                    if data.strip() == "[DONE]":
+                        break
+                    text = token_text(data)
+                    if text:
+                        parts.append(text)
+                        yield sse_event("token", {"text": text})
+            else:
+                reply = extract_reply(json.loads(await response.aread()))
+                parts.append(reply)
+                yield sse_event("token", {"text": reply})
+    except Exception as e:
+        print("🔥 Exception in /chat stream:", str(e))
+        yield sse_event("error", {"text": INTERNAL_ERROR_REPLY})
+    if parts:
+        await save_turn(user_id, "assistant", "".join(parts))
+    yield sse_event("done", {})
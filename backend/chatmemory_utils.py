@@ -1,23 +1,130 @@
-import boto3
-from boto3.dynamodb.conditions import Key
-from datetime import datetime, timedelta
-
-dynamodb = boto3.resource("dynamodb")
-chat_table = dynamodb.Table("ChatMemory")
-
-def fetch_recent_chat(user_id: str, limit: int = 6) -> str:
-    # Fetch latest chat turns from ChatMemory for user
-    response = chat_table.query(
-        KeyConditionExpression=Key("user_id").eq(user_id),
-        ScanIndexForward=False,  # descending order
-        Limit=limit
-    )
-    items = sorted(response.get("Items", []), key=lambda x: x["timestamp"])  # order chronologically
-
-    chat_history = ""
-    for item in items:
-        role = item.get("message_role", "user").capitalize()
-        msg = item.get("content", "").strip()
-        chat_history += f"{role}: {msg}\n"
-
-    return chat_history.strip()
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from .repositories import get_repositories
+
+# Per-user turn buffers kept in process; DynamoDB is only read for users not in the cache
+CHAT_CACHE_USERS = int(os.getenv("CHAT_CACHE_USERS", "1000"))
+CHAT_CACHE_TURNS = int(os.getenv("CHAT_CACHE_TURNS", "40"))
+CHAT_CACHE_BYTES = int(os.getenv("CHAT_CACHE_BYTES", str(32 * 1024)))
+
+
+def turn_size(turn) -> int:
+    return len(turn["content"].encode("utf-8"))
+
+
+class ChatContextCache:
+    """LRU over users of bounded ring buffers of their most recent chat turns.
+
+    Each buffer keeps at most `max_turns` turns and `max_bytes` of content,
+    dropping the oldest first; past `max_users` the least recently used user
+    is evicted whole.
+    """
+
+    def __init__(self, max_users: int = CHAT_CACHE_USERS, max_turns: int = CHAT_CACHE_TURNS,
+                 max_bytes: int = CHAT_CACHE_BYTES):
+        self.max_users = max_users
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self._buffers = OrderedDict()  # user_id -> [deque of turns, content bytes]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._buffers.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._buffers.move_to_end(user_id)
+            self.hits += 1
+            return list(entry[0])
+
+    def fill(self, user_id, turns):
+        with self._lock:
+            self._buffers[user_id] = [deque(), 0]
+            self._buffers.move_to_end(user_id)
+            for turn in turns:
+                self._push(user_id, turn)
+            while len(self._buffers) > self.max_users:
+                self._buffers.popitem(last=False)
+
+    def append(self, user_id, turn):
+        # Users not cached are left alone: their next read loads the full history, this turn included
+        with self._lock:
+            if user_id in self._buffers:
+                self._push(user_id, turn)
+
+    def _push(self, user_id, turn):
+        entry = self._buffers[user_id]
+        entry[0].append(turn)
+        entry[1] += turn_size(turn)
+        while len(entry[0]) > self.max_turns or (entry[1] > self.max_bytes and len(entry[0]) > 1):
+            entry[1] -= turn_size(entry[0].popleft())
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._buffers), "hits": self.hits, "misses": self.misses}
+
+
+chat_cache = ChatContextCache()
+
+
+async def load_recent_turns(user_id: str):
+    """Recent turns for a user, oldest first; only a cache miss reads ChatMemory."""
+    turns = chat_cache.get(user_id)
+    if turns is not None:
+        return turns
+
+    items = await get_repositories().chat_memory.recent_turns(user_id, limit=CHAT_CACHE_TURNS)
+    turns = [
+        {
+            "timestamp": item["timestamp"],
+            "role": item.get("message_role", "user"),
+            "content": item.get("content", "").strip(),
+        }
+        for item in items
+    ]
+    chat_cache.fill(user_id, turns)
+    return turns
+
+
+async def record_turn(user_id: str, role: str, content: str):
+    """Store a chat turn in ChatMemory and append it to the user's cached buffer."""
+    turn = {"timestamp": datetime.utcnow().isoformat(), "role": role, "content": content.strip()}
+    try:
+        await get_repositories().chat_memory.append(user_id, role, turn["content"], timestamp=turn["timestamp"])
+    except Exception as e:
+        # The chat still answers; the cache stays in step with what was actually stored
+        print("⚠️ Could not save chat turn:", e)
+        return None
+    chat_cache.append(user_id, turn)
+    return turn
+
+
+def format_turn(turn) -> str:
+    return f"{turn['role'].capitalize()}: {turn['content']}"
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English text; no tokenizer needed
+    return len(text) // 4 + 1
+
+
+async def assemble_context(user_id: str, token_budget: int, max_turns: int = None) -> str:
+    """Chat history for the prompt, newest turns first in priority, trimmed to `token_budget`."""
+    turns = await load_recent_turns(user_id)
+    if max_turns:
+        turns = turns[-max_turns:]
+    lines, used = [], 0
+    for turn in reversed(turns):
+        line = format_turn(turn)
+        cost = estimate_tokens(line) + 1  # + the newline
+        if used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(reversed(lines))
@@ -1,7 +1,11 @@
+import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///./journal.db"  # local SQLite file
+DATABASE_PATH = "./journal.db"  # local SQLite file
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+EMOTION_CACHE_PATH = os.path.join(os.path.dirname(DATABASE_PATH), "emotion_cache.db")
+DYNAMO_SPOOL_PATH = os.path.join(os.path.dirname(DATABASE_PATH), "dynamo_spool.jsonl")
 
 engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
@@ -9,3 +13,11 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+def ensure_column(table: str, column: str, ddl: str):
+    """Add a column to an existing table; create_all only creates missing tables."""
+    with engine.begin() as conn:
+        columns = [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+        if columns and column not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
@@ -0,0 +1,180 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+
+class DynamoWriteBehind:
+    """Write-behind queue that mirrors items to a DynamoDB table off the request path.
+
+    A background worker drains the queue through `batch_writer`, retrying failed
+    batches with exponential backoff. Batches that still fail are appended to a
+    JSON-lines spool file and replayed the next time the sink starts. The spool
+    is moved aside to `<spool>.replay` while replaying and removed only once every
+    replayed item has been written or spooled again, so a crash mid-replay loses
+    nothing (at worst some items are put twice).
+    """
+
+    def __init__(self, table, spool_path: str, prepare=None, dedupe_key=None,
+                 batch_size: int = 25, flush_interval: float = 1.0,
+                 max_retries: int = 4, backoff: float = 0.5):
+        self.table = table
+        self.spool_path = spool_path
+        self.prepare = prepare or (lambda item: item)
+        self.dedupe_key = dedupe_key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._spool_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = {}
+        self._seq = itertools.count()
+        self._replaying = set()
+        self.replay_path = spool_path + ".replay"
+        self.written = 0
+        self.retries = 0
+        self.spooled = 0
+        self.last_write_lag = 0.0
+
+        self._replay_spool()
+        self._worker = threading.Thread(target=self._run, name="dynamo-write-behind", daemon=True)
+        self._worker.start()
+
+    def submit(self, item: dict):
+        seq, enqueued_at = next(self._seq), time.time()
+        with self._pending_lock:
+            self._pending[seq] = enqueued_at
+        self._queue.put((item, seq))
+        return seq
+
+    def metrics(self):
+        now = time.time()
+        with self._pending_lock:
+            oldest = min(self._pending.values(), default=None)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "last_write_lag_seconds": round(self.last_write_lag, 3),
+            "written": self.written,
+            "retries": self.retries,
+            "spooled": self.spooled,
+        }
+
+    def close(self, timeout: float = 10.0):
+        """Flush what is queued; anything that cannot be written in time goes to the spool."""
+        self._stop.set()
+        self._worker.join(timeout)
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftovers:
+            self._spool(leftovers)
+            self._forget(leftovers)
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write_with_retry(batch)
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_with_retry(self, batch):
+        items = [item for item, _ in batch]
+        if self.dedupe_key:
+            # BatchWriteItem rejects duplicate keys, so the latest write for a key wins
+            items = list({self.dedupe_key(item): item for item in items}.values())
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.table.batch_writer() as writer:
+                    for item in items:
+                        writer.put_item(Item=self.prepare(dict(item)))
+                break
+            except Exception as e:
+                print(f"⚠️ DynamoDB write-behind attempt {attempt + 1} failed:", e)
+                if attempt == self.max_retries:
+                    self._spool(batch)
+                    self._forget(batch)
+                    return
+                self.retries += 1
+                self._stop.wait(min(self.backoff * (2 ** attempt), 30.0))
+
+        enqueued = self._forget(batch)
+        self.written += len(items)
+        if enqueued:
+            self.last_write_lag = time.time() - min(enqueued)
+
+    def _forget(self, batch):
+        with self._pending_lock:
+            enqueued = [self._pending.pop(seq, None) for _, seq in batch]
+            replayed = bool(self._replaying)
+            self._replaying.difference_update(seq for _, seq in batch)
+            if replayed and not self._replaying:
+                # Every replayed item is now in DynamoDB or back in the spool
+                os.remove(self.replay_path)
+        return [t for t in enqueued if t is not None]
+
+    def _spool(self, batch):
+        with self._spool_lock, open(self.spool_path, "a", encoding="utf-8") as f:
+            for item, _ in batch:
+                f.write(json.dumps(item) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.spooled += len(batch)
+        print(f"💾 Spooled {len(batch)} DynamoDB item(s) to {self.spool_path}")
+
+    def _replay_spool(self):
+        with self._spool_lock:
+            if os.path.exists(self.spool_path):
+                if os.path.exists(self.replay_path):
+                    # A replay was cut short last time; fold the new spool into it
+                    with open(self.spool_path, encoding="utf-8") as src, \
+                            open(self.replay_path, "a", encoding="utf-8") as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.spool_path)
+                else:
+                    os.replace(self.spool_path, self.replay_path)
+            if not os.path.exists(self.replay_path):
+                return
+            items, bad = [], []
+            with open(self.replay_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        items.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        bad.append(line if line.endswith("\n") else line + "\n")
+            if bad:
+                # Usually a line torn by a crash mid-spool; kept aside instead of failing startup
+                with open(self.spool_path + ".bad", "a", encoding="utf-8") as f:
+                    f.writelines(bad)
+                print(f"⚠️ Moved {len(bad)} unreadable spool line(s) to {self.spool_path}.bad")
+        if not items:
+            os.remove(self.replay_path)
+            return
+        # Runs before the worker starts, so nothing can be forgotten before it is tracked
+        self._replaying.update(self.submit(item) for item in items)
+        print(f"🔁 Replaying {len(items)} spooled DynamoDB item(s)")
@@ -0,0 +1,95 @@
+from datetime import date
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from . import models
+
+
+def month_key(day: date) -> str:
+    return day.strftime("%Y-%m")
+
+
+def _apply(row, all_emotions, stress_score, sign):
+    sums = dict(row.emotion_sums or {})
+    for res in all_emotions or []:
+        sums[res["emotion"]] = round(sums.get(res["emotion"], 0.0) + sign * res["score"], 6)
+    row.emotion_sums = sums  # reassign so the JSON column is flagged as changed
+    row.entry_count = (row.entry_count or 0) + sign
+    if stress_score is not None:
+        row.stress_sum = round((row.stress_sum or 0.0) + sign * stress_score, 6)
+        row.stress_count = (row.stress_count or 0) + sign
+    row.dominant_emotion = max(sums, key=sums.get) if sums and row.entry_count > 0 else None
+
+
+def record_journal_emotions(db: Session, day: date, all_emotions, stress_score=None, previous_emotions=None):
+    """Fold a new entry (or, with `previous_emotions`, an edited one) into its day and month rows.
+
+    Only stages the changes; the caller commits them together with the journal write,
+    and should do so right away: the rows stay write-locked until then.
+    """
+    targets = (
+        (models.DailyEmotionAggregate, {"day": day}),
+        (models.MonthlyEmotionAggregate, {"month": month_key(day)}),
+    )
+    for model, key in targets:
+        # Create-if-missing as one statement, so concurrent writers never race on the insert.
+        # It also takes SQLite's write lock, so the row read below can't go stale before commit.
+        db.execute(
+            insert(model)
+            .values(**key, entry_count=0, emotion_sums={}, stress_sum=0.0, stress_count=0)
+            .on_conflict_do_nothing(index_elements=list(key))
+        )
+        row = db.get(model, next(iter(key.values())), populate_existing=True)
+        if previous_emotions is not None:
+            _apply(row, previous_emotions, None, -1)
+        _apply(row, all_emotions, stress_score, +1)
+
+
+def rebuild_emotion_aggregates(db: Session):
+    """Recompute every aggregate row from the stored journal entries."""
+    db.query(models.DailyEmotionAggregate).delete()
+    db.query(models.MonthlyEmotionAggregate).delete()
+    db.flush()
+    for journal in db.query(models.JournalEntry).yield_per(200):
+        record_journal_emotions(db, journal.date, journal.all_emotions)
+        db.flush()
+    db.commit()
+
+
+def ensure_emotion_aggregates(db: Session):
+    """Backfill the aggregate tables once for journals written before they existed."""
+    has_aggregates = db.query(models.DailyEmotionAggregate.day).first() is not None
+    has_journals = db.query(models.JournalEntry.id).first() is not None
+    if has_journals and not has_aggregates:
+        rebuild_emotion_aggregates(db)
+
+
+def serialize_aggregate(row, key):
+    count = row.entry_count or 0
+    return {
+        "period": key,
+        "entry_count": count,
+        "dominant_emotion": row.dominant_emotion,
+        "emotion_means": {
+            emotion: round(total / count, 3) for emotion, total in (row.emotion_sums or {}).items()
+        } if count else {},
+        "stress_score": round(row.stress_sum / row.stress_count, 3) if row.stress_count else None,
+    }
+
+
+def read_calendar(db: Session, start: date, end: date, granularity: str = "day"):
+    if granularity == "month":
+        rows = (
+            db.query(models.MonthlyEmotionAggregate)
+            .filter(models.MonthlyEmotionAggregate.month.between(month_key(start), month_key(end)))
+            .order_by(models.MonthlyEmotionAggregate.month)
+            .all()
+        )
+        return [serialize_aggregate(row, row.month) for row in rows if row.entry_count]
+
+    rows = (
+        db.query(models.DailyEmotionAggregate)
+        .filter(models.DailyEmotionAggregate.day.between(start, end))
+        .order_by(models.DailyEmotionAggregate.day)
+        .all()
+    )
+    return [serialize_aggregate(row, row.day.isoformat()) for row in rows if row.entry_count]
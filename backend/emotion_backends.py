@@ -0,0 +1,198 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+import requests
+
+
+class EmotionBackendError(Exception):
+    pass
+
+
+class EmotionBackend:
+    """Classifies a batch of texts into per-label emotion scores.
+
+    `classify` returns one list of {"label", "score"} dicts per input text,
+    sorted by score (highest first), like the Hugging Face inference API.
+    """
+
+    model_id = "unknown"
+
+    def classify(self, texts: List[str]) -> List[List[dict]]:
+        raise NotImplementedError
+
+
+# 🌐 Hosted Hugging Face inference endpoint
+class HuggingFaceAPIBackend(EmotionBackend):
+    def __init__(self, api_url: str, api_token: str, timeout: float = 30.0):
+        if api_token is None:
+            raise RuntimeError("HF_API_TOKEN not found. Check your .env file.")
+        self.api_url = api_url
+        self.model_id = api_url.split("/models/")[-1]
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_token}"
+
+    def classify(self, texts):
+        try:
+            response = self.session.post(self.api_url, json={"inputs": list(texts)}, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            raise EmotionBackendError(str(e))
+
+
+# 🖥️ In-process distilroberta-style classifier loaded from a local directory
+class LocalEmotionBackend(EmotionBackend):
+    def __init__(self, model_dir: str, max_length: int = 512, num_threads: int = None):
+        # Heavy imports stay here so the hosted backend never pays for them
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        self.model.eval()
+        self.max_length = max_length
+        self.model_id = getattr(self.model.config, "_name_or_path", None) or os.path.basename(model_dir.rstrip("/\\"))
+        self.labels = self.model.config.id2label
+        self._lock = threading.Lock()
+
+    def classify(self, texts):
+        if not texts:
+            return []
+        try:
+            encoded = self.tokenizer(
+                list(texts),
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt",
+            )
+            with self._lock, self._torch.inference_mode():
+                logits = self.model(**encoded).logits
+            probabilities = self._torch.softmax(logits, dim=-1).tolist()
+        except Exception as e:
+            raise EmotionBackendError(f"Local emotion model failed: {e}")
+
+        return [
+            sorted(
+                ({"label": self.labels[i], "score": p} for i, p in enumerate(row)),
+                key=lambda r: r["score"],
+                reverse=True,
+            )
+            for row in probabilities
+        ]
+
+
+# 🧪 Tiny deterministic stand-in model for tests and offline runs
+STUB_LEXICON = {
+    "anger": {"angry", "furious", "annoyed", "mad", "hate", "rage"},
+    "disgust": {"disgusting", "gross", "sick", "awful"},
+    "fear": {"afraid", "scared", "anxious", "worried", "nervous", "panic"},
+    "joy": {"happy", "glad", "great", "love", "excited", "calm", "good"},
+    "sadness": {"sad", "tired", "lonely", "cry", "hopeless", "down", "exhausted"},
+    "surprise": {"wow", "surprised", "unexpected", "suddenly"},
+}
+
+
+class StubEmotionBackend(EmotionBackend):
+    model_id = "stub-lexicon-v1"
+
+    def classify(self, texts):
+        return [self._classify_one(text) for text in texts]
+
+    def _classify_one(self, text):
+        words = [w.strip(".,!?;:'\"").lower() for w in text.split()]
+        counts = {label: sum(w in lexicon for w in words) for label, lexicon in STUB_LEXICON.items()}
+        total = sum(counts.values())
+        if total == 0:
+            scores = {label: 0.02 for label in counts}
+            scores["neutral"] = 1.0 - 0.02 * len(counts)
+        else:
+            scores = {label: 0.9 * c / total + 0.01 for label, c in counts.items()}
+            scores["neutral"] = 1.0 - sum(scores.values())
+        return sorted(
+            ({"label": label, "score": score} for label, score in scores.items()),
+            key=lambda r: r["score"],
+            reverse=True,
+        )
+
+
+# ⏱️ Gathers concurrent classify() calls for a few ms and runs them as one batch
+class MicroBatcher(EmotionBackend):
+    def __init__(self, backend: EmotionBackend, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.backend = backend
+        self.model_id = backend.model_id
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="emotion-microbatcher", daemon=True)
+        self._worker.start()
+
+    def classify(self, texts):
+        if not texts:
+            return []
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._flush(pending)
+
+    def _flush(self, pending):
+        # Callers often share words ("I", "today"), so each text runs once per batch
+        unique_texts = list(dict.fromkeys(text for texts, _ in pending for text in texts))
+        try:
+            results = self.backend.classify(unique_texts)
+            if len(results) != len(unique_texts):
+                raise EmotionBackendError(f"Classifier returned {len(results)} results for {len(unique_texts)} inputs")
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        by_text = dict(zip(unique_texts, results))
+        for texts, future in pending:
+            future.set_result([by_text[text] for text in texts])
+
+
+def create_emotion_backend(kind: str, api_url: str = None, api_token: str = None, model_dir: str = None,
+                           microbatch_ms: float = 5.0, max_batch_size: int = 64) -> EmotionBackend:
+    """Build the backend selected by EMOTION_BACKEND ("huggingface", "local" or "stub")."""
+    kind = (kind or "huggingface").lower()
+    if kind == "huggingface":
+        backend = HuggingFaceAPIBackend(api_url, api_token)
+    elif kind == "local":
+        if not model_dir:
+            raise RuntimeError("EMOTION_MODEL_DIR must point to a model directory for the local backend.")
+        backend = LocalEmotionBackend(model_dir, num_threads=int(os.getenv("EMOTION_NUM_THREADS", "0")) or None)
+    elif kind == "stub":
+        backend = StubEmotionBackend()
+    else:
+        raise RuntimeError(f"Unknown EMOTION_BACKEND: {kind}")
+
+    # Only the in-process model gains from batching; MicroBatcher has a single worker, so
+    # wrapping the hosted API would serialize every HTTP call behind the slowest one
+    if kind == "local" and microbatch_ms > 0:
+        backend = MicroBatcher(backend, max_batch_size=max_batch_size, max_wait_ms=microbatch_ms)
+    return backend
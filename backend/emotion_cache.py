@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class EmotionCache:
+    """Per-word emotion results keyed by (model id, normalized word).
+
+    A bounded in-memory LRU sits in front of a SQLite table, so common words
+    ("I", "today", "tired") are classified once per model and reused across
+    entries, edits and restarts. Opening the cache with a different model id
+    drops every result produced by the previous model.
+    """
+
+    def __init__(self, db_path: str, model_id: str, max_entries: int = 50000):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS word_emotion_cache ("
+            "model_id TEXT NOT NULL, token TEXT NOT NULL, emotion TEXT NOT NULL, score REAL NOT NULL, "
+            "PRIMARY KEY (model_id, token)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS word_emotion_cache_meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self._conn.execute("SELECT value FROM word_emotion_cache_meta WHERE key = 'model_id'").fetchone()
+        if row is None or row[0] != model_id:
+            self.invalidate()
+
+    def get_many(self, tokens):
+        """Return {token: {"emotion", "score"}} for every token that is cached."""
+        found = {}
+        with self._lock:
+            missing = []
+            for token in tokens:
+                if token in self._memory:
+                    self._memory.move_to_end(token)
+                    found[token] = self._memory[token]
+                    self.memory_hits += 1
+                else:
+                    missing.append(token)
+
+            # SQLite caps bound parameters per statement, so look up in chunks
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT token, emotion, score FROM word_emotion_cache "
+                    f"WHERE model_id = ? AND token IN ({','.join('?' * len(chunk))})",
+                    [self.model_id, *chunk],
+                ).fetchall()
+                for token, emotion, score in rows:
+                    found[token] = {"emotion": emotion, "score": score}
+                    self._remember(token, found[token])
+                self.disk_hits += len(rows)
+                self.misses += len(chunk) - len(rows)
+        return found
+
+    def put_many(self, results):
+        """Store {token: {"emotion", "score"}} in both tiers."""
+        if not results:
+            return
+        with self._lock:
+            for token, value in results.items():
+                self._remember(token, value)
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO word_emotion_cache (model_id, token, emotion, score) VALUES (?, ?, ?, ?)",
+                    [(self.model_id, token, v["emotion"], v["score"]) for token, v in results.items()],
+                )
+
+    def invalidate(self):
+        """Forget every cached result and mark the current model as the owner of the cache."""
+        with self._lock:
+            self._memory.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM word_emotion_cache")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO word_emotion_cache_meta (key, value) VALUES ('model_id', ?)",
+                    (self.model_id,),
+                )
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model_id": self.model_id,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def _remember(self, token, value):
+        self._memory[token] = value
+        self._memory.move_to_end(token)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
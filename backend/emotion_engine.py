@@ -0,0 +1,69 @@
+import difflib
+import os
+import re
+
+from .emotion_backends import EmotionBackendError
+
+# Words sent to the emotion classifier per request
+EMOTION_BATCH_SIZE = int(os.getenv("EMOTION_BATCH_SIZE", "32"))
+
+_EDGE_PUNCT = re.compile(r"^\W+|\W+$")
+
+
+def normalize_word(word: str) -> str:
+    """Lowercase a token and strip surrounding punctuation ("Tired," -> "tired")."""
+    stripped = _EDGE_PUNCT.sub("", word).lower()
+    return stripped or word.lower()
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def top_emotion(results):
+    """Pick the highest scoring label out of a classifier result list."""
+    best = max(results, key=lambda r: r["score"])
+    return {"emotion": best["label"].lower(), "score": round(best["score"], 3)}
+
+
+def score_words(words, classify_batch, batch_size: int = EMOTION_BATCH_SIZE, cache=None):
+    """Score every word of an entry, classifying each distinct normalized token once.
+
+    `classify_batch` takes a list of strings and returns one classifier result
+    list per string, in the same order. When an `EmotionCache` is given, only
+    tokens it does not already know are sent to the classifier.
+    """
+    unique_tokens = list(dict.fromkeys(normalize_word(w) for w in words))
+
+    scored = cache.get_many(unique_tokens) if cache is not None else {}
+    to_classify = [token for token in unique_tokens if token not in scored]
+
+    fresh = {}
+    for batch in chunked(to_classify, max(1, batch_size)):
+        batch_results = classify_batch(batch)
+        if len(batch_results) != len(batch):
+            raise EmotionBackendError(f"Classifier returned {len(batch_results)} results for {len(batch)} inputs")
+        for token, results in zip(batch, batch_results):
+            fresh[token] = top_emotion(results)
+
+    if cache is not None:
+        cache.put_many(fresh)
+    scored.update(fresh)
+
+    return [{"text": word, **scored[normalize_word(word)]} for word in words]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def unchanged_token_positions(old_tokens, new_tokens):
+    """Map new token positions to old ones for tokens an edit left untouched."""
+    matcher = difflib.SequenceMatcher(a=old_tokens, b=new_tokens, autojunk=False)
+    kept = {}
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(i2 - i1):
+                kept[j1 + offset] = i1 + offset
+    return kept
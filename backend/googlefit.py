@@ -1,10 +1,9 @@
 # Example using FastAPI
 from fastapi import FastAPI, Request
 from pydantic import BaseModel
-import boto3
 from datetime import datetime
-from decimal import Decimal
 from fastapi.middleware.cors import CORSMiddleware
+from .repositories import get_repositories
 
 
 app = FastAPI()
@@ -18,8 +17,7 @@ app.add_middleware(
 
 
 
-dynamodb = boto3.resource("dynamodb", region_name="ap-south-1")  # change region if needed
-table = dynamodb.Table("UserHealthData")  # make sure this exists
+repos = get_repositories()  # UserHealthData lives behind repos.health
 
 class HealthData(BaseModel):
     user_id: str
@@ -29,13 +27,7 @@ class HealthData(BaseModel):
 
 @app.post("/save-health-data")
 async def save_health_data(data: HealthData):
-    table.put_item(
-        Item={
-            "user_id": data.user_id,
-            "date": data.date,
-            "sleep": Decimal(str(data.sleep)),  # 👈 convert to Decimal
-            "hrv": Decimal(str(data.hrv))       # 👈 convert to Decimal
-        }
-    )
+    # Runs on the repository's bounded executor; floats become Decimal there
+    await repos.health.save(data.user_id, data.date, data.sleep, data.hrv)
     return {"message": "✅ Health data saved to DynamoDB!"}
 
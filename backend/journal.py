@@ -1,22 +1,31 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from uuid import uuid4
 from datetime import date, datetime
-from sqlalchemy.orm import Session
-from .database import Base, SessionLocal, engine
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, selectinload, undefer
+from .database import Base, SessionLocal, engine, ensure_column, EMOTION_CACHE_PATH, DYNAMO_SPOOL_PATH
 from . import models
-import requests
+from .emotion_engine import normalize_text, score_words, unchanged_token_positions
+from .emotion_backends import EmotionBackendError, create_emotion_backend
+from .emotion_cache import EmotionCache
+from .dynamo_sink import DynamoWriteBehind
+from .emotion_aggregates import ensure_emotion_aggregates, read_calendar, record_journal_emotions
+from .word_emotion_codec import pack_word_emotions, unpack_word_emotions
+from .util.dynamo_utils import convert_floats_to_decimal
+from .util.granite_utils import parse_risk_xml
+import asyncio
+import json
 import os
 from dotenv import load_dotenv
 import boto3
-from decimal import Decimal
 load_dotenv()
 from ibm_watsonx_ai.foundation_models import ModelInference
 from ibm_watsonx_ai.credentials import Credentials
 from ibm_watsonx_ai import APIClient
-import re
 
 # Watsonx credentials
 credentials = Credentials(
@@ -56,13 +65,10 @@ def get_granite_stress_score(text: str):
         response = guardian_model.generate(prompt)
         result = response["results"][0]["generated_text"]
 
-        harm = re.search(r"<harm>(.*?)</harm>", result)
-        confidence = re.search(r"<confidence>(.*?)</confidence>", result)
-        comment = re.search(r"<comment>(.*?)</comment>", result)
-
-        harm_val = harm.group(1).strip() if harm else "Unknown"
-        score_val = float(confidence.group(1).strip()) if confidence else 0.0
-        comment_val = comment.group(1).strip() if comment else "Not provided"
+        parsed = parse_risk_xml(result)
+        harm_val = parsed["harm"] or "Unknown"
+        score_val = float(parsed["confidence"]) if parsed["confidence"] is not None else 0.0
+        comment_val = parsed["comment"] or "Not provided"
 
         return {
             "risk_detected": harm_val,
@@ -78,44 +84,57 @@ def get_granite_stress_score(text: str):
         }
 
 
-def convert_floats_to_decimal(obj):
-    if isinstance(obj, float):
-        return Decimal(str(obj))
-    elif isinstance(obj, list):
-        return [convert_floats_to_decimal(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_floats_to_decimal(v) for k, v in obj.items()}
-    else:
-        return obj
+# Mirror writes are queued and flushed in the background, off the request path
+dynamo_sink = DynamoWriteBehind(
+    dynamo_table,
+    spool_path=os.getenv("DYNAMO_SPOOL_PATH", DYNAMO_SPOOL_PATH),
+    prepare=convert_floats_to_decimal,
+    dedupe_key=lambda item: item.get("id"),
+    flush_interval=float(os.getenv("DYNAMO_FLUSH_INTERVAL", "1.0")),
+)
 
 def save_to_dynamodb(item: dict):
     item["user_id"] = FIXED_USER_ID
-    item = convert_floats_to_decimal(item)
-    try:
-        dynamo_table.put_item(Item=item)
-    except Exception as e:
-        print(f"❌ DynamoDB Upload Error (id={item.get('id')}):", e)
+    dynamo_sink.submit(item)
 
 
 HF_API_TOKEN = os.getenv("HF_API_TOKEN")
-if HF_API_TOKEN is None:
-    raise RuntimeError("HF_API_TOKEN not found. Check your .env file.")
-
 HUGGINGFACE_API_URL = "https://api-inference.huggingface.co/models/j-hartmann/emotion-english-distilroberta-base"
-HEADERS = {
-    "Authorization": f"Bearer {HF_API_TOKEN}",
-}
+
+# "huggingface" (hosted API), "local" (EMOTION_MODEL_DIR) or "stub"
+emotion_backend = create_emotion_backend(
+    os.getenv("EMOTION_BACKEND", "huggingface"),
+    api_url=HUGGINGFACE_API_URL,
+    api_token=HF_API_TOKEN,
+    model_dir=os.getenv("EMOTION_MODEL_DIR"),
+    microbatch_ms=float(os.getenv("EMOTION_MICROBATCH_MS", "5")),
+    max_batch_size=int(os.getenv("EMOTION_MICROBATCH_SIZE", "64")),
+)
+emotion_cache = EmotionCache(
+    os.getenv("EMOTION_CACHE_PATH", EMOTION_CACHE_PATH),
+    model_id=emotion_backend.model_id,
+    max_entries=int(os.getenv("EMOTION_CACHE_SIZE", "50000")),
+)
 
 # Initialize DB and app
 models.Base.metadata.create_all(bind=engine)
+ensure_column("word_emotions", "position", "INTEGER")
+ensure_column("journal_entries", "word_emotions_blob", "BLOB")
+with SessionLocal() as startup_db:
+    ensure_emotion_aggregates(startup_db)
 app = FastAPI()
 
+@app.on_event("shutdown")
+def flush_dynamo_sink():
+    dynamo_sink.close()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Pydantic models
@@ -158,20 +177,17 @@ def get_db():
     finally:
         db.close()
 
-# Emotion analysis via Hugging Face API
+# Emotion analysis via the configured backend
 def call_emotion_api(text: str):
+    return call_emotion_api_batch([text])[0]
+
+def call_emotion_api_batch(texts: List[str]):
     try:
-        response = requests.post(
-            HUGGINGFACE_API_URL,
-            headers=HEADERS,
-            json={"inputs": text}
-        )
-        response.raise_for_status()
-        return response.json()[0]
-    except requests.exceptions.RequestException as e:
+        return emotion_backend.classify(texts)
+    except EmotionBackendError as e:
         raise HTTPException(status_code=500, detail=f"Emotion API call failed: {str(e)}")
 
-def analyze_emotions(text: str):
+def analyze_full_text(text: str):
     full_text_results = call_emotion_api(text)
     dominant_emotion = full_text_results[0]['label'].lower()
     dominant_score = round(full_text_results[0]['score'], 3)
@@ -179,38 +195,91 @@ def analyze_emotions(text: str):
         {"emotion": res['label'].lower(), "score": round(res['score'], 3)}
         for res in full_text_results
     ]
+    return dominant_emotion, dominant_score, all_emotions
 
-    words = text.split()
-    word_emotions = []
-    for word in words:
-        word_result = call_emotion_api(word)
-        result = word_result[0]
-        word_emotions.append({
-            "text": word,
-            "emotion": result['label'].lower(),
-            "score": round(result['score'], 3)
-        })
+def analyze_words(words: List[str]):
+    # Each distinct word is classified once, in batches
+    try:
+        return score_words(words, call_emotion_api_batch, cache=emotion_cache)
+    except EmotionBackendError as e:
+        raise HTTPException(status_code=500, detail=f"Emotion API call failed: {str(e)}")
 
+def analyze_emotions(text: str):
+    dominant_emotion, dominant_score, all_emotions = analyze_full_text(text)
+    word_emotions = analyze_words(text.split())
     return dominant_emotion, dominant_score, all_emotions, word_emotions
 
-# Routes
-@app.post("/journal-entry", response_model=JournalEntryResponse)
-def create_journal_entry(entry: JournalRequest, db: Session = Depends(get_db)):
-    existing = db.query(models.JournalEntry).filter(models.JournalEntry.date == entry.date).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Journal entry for this date already exists")
+# "rows" keeps one WordEmotion row per word, "packed" stores one blob per entry
+WORD_EMOTION_STORAGE = os.getenv("WORD_EMOTION_STORAGE", "rows")
 
-    # Emotion analysis
-    dominant_emotion, dominant_score, all_emotions, word_emotions_data = analyze_emotions(entry.text)
+def load_word_emotions(journal: models.JournalEntry):
+    if journal.word_emotions_blob is not None:
+        return unpack_word_emotions(journal.text or "", journal.word_emotions_blob)
+    return [
+        {"text": w.text, "emotion": w.emotion, "score": w.score}
+        for w in journal.word_emotions
+    ]
 
-    # Granite risk score
-    granite_result = get_granite_stress_score(entry.text)
-    stress_score = granite_result["stress_score"]
-    risk_detected = granite_result["risk_detected"]
-    risk_comment = granite_result["risk_comment"]
+def store_word_emotions(journal: models.JournalEntry, word_emotions_data, reusable_rows=None):
+    """Attach word emotions to a journal (whose text is already set) in the configured format."""
+    if WORD_EMOTION_STORAGE == "packed":
+        journal.word_emotions_blob = pack_word_emotions(journal.text, word_emotions_data)
+        journal.word_emotions = []
+        return
+
+    reusable_rows = reusable_rows or {}
+    rows = []
+    for position, word in enumerate(word_emotions_data):
+        row = reusable_rows.get(position) or models.WordEmotion(
+            id=str(uuid4()),
+            text=word['text'],
+            emotion=word['emotion'],
+            score=word['score']
+        )
+        row.position = position
+        rows.append(row)
+    journal.word_emotions_blob = None
+    journal.word_emotions = rows  # rows left out are deleted as orphans
 
-    # Create journal entry
-    journal_id = str(uuid4())
+# Per-stage budgets for the journal write pipeline (seconds)
+EMOTION_STAGE_TIMEOUT = float(os.getenv("EMOTION_STAGE_TIMEOUT", "30"))
+RISK_STAGE_TIMEOUT = float(os.getenv("RISK_STAGE_TIMEOUT", "20"))
+
+async def run_analysis_pipeline(text: str):
+    """Run emotion analysis and Granite risk scoring concurrently.
+
+    Emotions are required for an entry, so an emotion failure is raised. A
+    failed or slow risk stage only degrades to an "Unknown" risk result.
+    """
+    emotion_task = asyncio.create_task(
+        asyncio.wait_for(asyncio.to_thread(analyze_emotions, text), EMOTION_STAGE_TIMEOUT)
+    )
+    risk_task = asyncio.create_task(
+        asyncio.wait_for(asyncio.to_thread(get_granite_stress_score, text), RISK_STAGE_TIMEOUT)
+    )
+    emotion_result, risk_result = await asyncio.gather(emotion_task, risk_task, return_exceptions=True)
+
+    if isinstance(emotion_result, asyncio.TimeoutError):
+        raise HTTPException(status_code=504, detail="Emotion analysis timed out")
+    if isinstance(emotion_result, BaseException):
+        raise emotion_result
+
+    if isinstance(risk_result, BaseException):
+        reason = "Timed out" if isinstance(risk_result, asyncio.TimeoutError) else "Error during analysis"
+        print("⚠️ Granite risk stage skipped:", reason)
+        risk_result = {
+            "risk_detected": "Unknown",
+            "stress_score": 0.0,
+            "risk_comment": reason
+        }
+
+    return emotion_result, risk_result
+
+def journal_date_taken(db: Session, entry_date: date) -> bool:
+    return db.query(models.JournalEntry).filter(models.JournalEntry.date == entry_date).first() is not None
+
+def store_journal_entry(db: Session, journal_id: str, entry: JournalRequest, emotions, stress_score: Optional[float]):
+    dominant_emotion, dominant_score, all_emotions, word_emotions_data = emotions
     journal = models.JournalEntry(
         id=journal_id,
         text=entry.text,
@@ -219,23 +288,34 @@ def create_journal_entry(entry: JournalRequest, db: Session = Depends(get_db)):
         dominant_score=dominant_score,
         all_emotions=all_emotions
     )
-    for word in word_emotions_data:
-        journal.word_emotions.append(models.WordEmotion(
-            id=str(uuid4()),
-            text=word['text'],
-            emotion=word['emotion'],
-            score=word['score']
-        ))
+    store_word_emotions(journal, word_emotions_data)
 
     db.add(journal)
+    record_journal_emotions(db, entry.date, all_emotions, stress_score)
     db.commit()
-    db.refresh(journal)
 
-    # Save full data to DynamoDB
+# Routes
+@app.post("/journal-entry", response_model=JournalEntryResponse)
+async def create_journal_entry(entry: JournalRequest, db: Session = Depends(get_db)):
+    if await asyncio.to_thread(journal_date_taken, db, entry.date):
+        raise HTTPException(status_code=400, detail="Journal entry for this date already exists")
+
+    # Emotion analysis and Granite risk score run side by side
+    emotions, granite_result = await run_analysis_pipeline(entry.text)
+    dominant_emotion, dominant_score, all_emotions, word_emotions_data = emotions
+    stress_score = granite_result["stress_score"]
+    risk_detected = granite_result["risk_detected"]
+    risk_comment = granite_result["risk_comment"]
+
+    # Persist to SQLite, then mirror to DynamoDB
+    journal_id = str(uuid4())
+    # A failed risk stage reports 0.0; keep it out of the calendar's stress means
+    aggregate_stress = None if risk_detected == "Unknown" else stress_score
+    await asyncio.to_thread(store_journal_entry, db, journal_id, entry, emotions, aggregate_stress)
     save_to_dynamodb({
-        "id": journal.id,
-        "text": journal.text,
-        "date": journal.date.isoformat(),
+        "id": journal_id,
+        "text": entry.text,
+        "date": entry.date.isoformat(),
         "dominant_emotion": dominant_emotion,
         "dominant_score": dominant_score,
         "stress_score": stress_score,
@@ -246,9 +326,9 @@ def create_journal_entry(entry: JournalRequest, db: Session = Depends(get_db)):
     })
 
     return {
-        "id": journal.id,
-        "text": journal.text,
-        "date": journal.date,
+        "id": journal_id,
+        "text": entry.text,
+        "date": entry.date,
         "dominant_emotion": dominant_emotion,
         "dominant_score": dominant_score,
         "stress_score": stress_score,
@@ -263,23 +343,47 @@ def update_journal_entry(entry_id: str, request: JournalEditRequest, db: Session
     if not journal:
         raise HTTPException(status_code=404, detail="Journal entry not found")
 
-    db.query(models.WordEmotion).filter(models.WordEmotion.journal_id == journal.id).delete()
+    packed = journal.word_emotions_blob is not None
+    old_words = load_word_emotions(journal)
+    old_rows = [] if packed else list(journal.word_emotions)
+    old_tokens = [w["text"] for w in old_words]
+    new_tokens = request.text.split()
+
+    # Only the full text and the tokens the edit touched go back to the classifier
+    previous_emotions = None
+    if normalize_text(request.text) == normalize_text(journal.text or ""):
+        dominant_emotion = journal.dominant_emotion
+        dominant_score = journal.dominant_score or 0.0
+        all_emotions = journal.all_emotions or []
+    else:
+        dominant_emotion, dominant_score, all_emotions = analyze_full_text(request.text)
+        previous_emotions = journal.all_emotions or []
+
+    if old_tokens == (journal.text or "").split():
+        kept = unchanged_token_positions(old_tokens, new_tokens)
+    else:
+        kept = {}  # stored words don't line up with the text, re-score everything
+    changed_positions = [i for i in range(len(new_tokens)) if i not in kept]
+    rescored = iter(analyze_words([new_tokens[i] for i in changed_positions]))
+
+    word_emotions_data = [
+        {**old_words[kept[i]], "text": token} if i in kept else next(rescored)
+        for i, token in enumerate(new_tokens)
+    ]
 
-    dominant_emotion, dominant_score, all_emotions, word_emotions_data = analyze_emotions(request.text)
     journal.text = request.text
     journal.dominant_emotion = dominant_emotion
     journal.dominant_score = dominant_score
     journal.all_emotions = all_emotions
-    journal.word_emotions = []
-
-    for word in word_emotions_data:
-        journal.word_emotions.append(models.WordEmotion(
-            id=str(uuid4()),
-            text=word['text'],
-            emotion=word['emotion'],
-            score=word['score']
-        ))
+    store_word_emotions(
+        journal,
+        word_emotions_data,
+        reusable_rows={i: old_rows[kept[i]] for i in kept} if old_rows else None
+    )
 
+    # Aggregates last, just before the commit, so their rows are locked only briefly
+    if previous_emotions is not None:
+        record_journal_emotions(db, journal.date, all_emotions, previous_emotions=previous_emotions)
     db.commit()
     db.refresh(journal)
 
@@ -303,6 +407,17 @@ def update_journal_entry(entry_id: str, request: JournalEditRequest, db: Session
         "word_emotions": word_emotions_data
     }
 
+def serialize_journal(journal: models.JournalEntry, include_words: bool = True):
+    return {
+        "id": journal.id,
+        "text": journal.text,
+        "date": journal.date,
+        "dominant_emotion": journal.dominant_emotion,
+        "dominant_score": journal.dominant_score or 0.0,
+        "all_emotions": journal.all_emotions or [],
+        "word_emotions": load_word_emotions(journal) if include_words else []
+    }
+
 @app.get("/journal-entry/by-date", response_model=JournalEntryResponse)
 def get_journal_by_date(date_str: str = Query(...), db: Session = Depends(get_db)):
     try:
@@ -314,39 +429,91 @@ def get_journal_by_date(date_str: str = Query(...), db: Session = Depends(get_db
     if not journal:
         raise HTTPException(status_code=404, detail="No journal entry found for this date")
 
+    return serialize_journal(journal)
+
+def encode_cursor(journal: models.JournalEntry) -> str:
+    return f"{journal.date.isoformat()}:{journal.id}"
+
+def journals_page_query(db: Session, cursor: Optional[str], include_words: bool = True):
+    """Journals in (date, id) order with word emotions loaded in one extra query."""
+    query = db.query(models.JournalEntry).order_by(models.JournalEntry.date, models.JournalEntry.id)
+    if include_words:
+        query = query.options(
+            selectinload(models.JournalEntry.word_emotions),
+            undefer(models.JournalEntry.word_emotions_blob)
+        )
+    if cursor:
+        try:
+            cursor_date_str, cursor_id = cursor.split(":", 1)
+            cursor_date = datetime.strptime(cursor_date_str, "%Y-%m-%d").date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        query = query.filter(or_(
+            models.JournalEntry.date > cursor_date,
+            and_(models.JournalEntry.date == cursor_date, models.JournalEntry.id > cursor_id)
+        ))
+    return query
+
+def stream_journals(cursor: Optional[str], limit: Optional[int], include_words: bool):
+    # The request-scoped session may be closed before streaming ends, so use our own
+    db = SessionLocal()
+    try:
+        query = journals_page_query(db, cursor, include_words)
+        if limit:
+            query = query.limit(limit)
+        for journal in query.yield_per(100):
+            entry = serialize_journal(journal, include_words)
+            entry["date"] = entry["date"].isoformat()
+            yield json.dumps(entry) + "\n"
+    finally:
+        db.close()
+
+@app.get("/journal-entries", response_model=List[JournalEntryResponse])
+def get_all_journals(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    stream: bool = False,
+    include_words: bool = True,
+    db: Session = Depends(get_db)
+):
+    """All journals by default; pass `limit` (and the returned X-Next-Cursor) to page,
+    `stream=true` for NDJSON, or `include_words=false` to skip word-level detail."""
+    if stream:
+        journals_page_query(db, cursor)  # validates the cursor before streaming starts
+        return StreamingResponse(stream_journals(cursor, limit, include_words), media_type="application/x-ndjson")
+
+    query = journals_page_query(db, cursor, include_words)
+    if limit:
+        journals = query.limit(limit + 1).all()
+        if len(journals) > limit:
+            journals = journals[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(journals[-1])
+    else:
+        journals = query.all()
+
+    return [serialize_journal(j, include_words) for j in journals]
+
+
+@app.get("/journal-calendar")
+def get_journal_calendar(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    granularity: str = Query("day", pattern="^(day|month)$"),
+    db: Session = Depends(get_db)
+):
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="`from` must not be after `to`.")
     return {
-        "id": journal.id,
-        "text": journal.text,
-        "date": journal.date,
-        "dominant_emotion": journal.dominant_emotion,
-        "dominant_score": journal.dominant_score or 0.0,
-        "all_emotions": journal.all_emotions or [],
-        "word_emotions": [
-            {"text": w.text, "emotion": w.emotion, "score": w.score}
-            for w in journal.word_emotions
-        ]
+        "granularity": granularity,
+        "periods": read_calendar(db, from_date, to_date, granularity)
     }
 
-@app.get("/journal-entries", response_model=List[JournalEntryResponse])
-def get_all_journals(db: Session = Depends(get_db)):
-    journals = db.query(models.JournalEntry).all()
-    response = []
-    for j in journals:
-        entry = JournalEntryResponse(
-            id=j.id,
-            text=j.text,
-            date=j.date,
-            dominant_emotion=j.dominant_emotion,
-            dominant_score=j.dominant_score or 0.0,
-            all_emotions=j.all_emotions or [],
-            word_emotions=[
-                WordEmotionOut(
-                    text=w.text,
-                    emotion=w.emotion,
-                    score=w.score
-                )
-                for w in j.word_emotions
-            ]
-        )
-        response.append(entry)
-    return response
+
+@app.get("/dynamo-sync/metrics")
+def get_dynamo_sync_metrics():
+    return dynamo_sink.metrics()
+
+@app.get("/emotion-cache/stats")
+def get_emotion_cache_stats():
+    return emotion_cache.stats()
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Date, Float, Text, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Date, Float, Integer, LargeBinary, Text, ForeignKey
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.dialects.sqlite import JSON
 from .database import Base
 
@@ -13,8 +13,17 @@ class JournalEntry(Base):
     dominant_score = Column(Float)
     all_emotions = Column(JSON)
 
+    # Packed word emotions (see word_emotion_codec); used instead of WordEmotion rows
+    # when WORD_EMOTION_STORAGE=packed, and only loaded when word detail is needed
+    word_emotions_blob = deferred(Column(LargeBinary))
+
     # ✅ Define relationship to WordEmotion
-    word_emotions = relationship("WordEmotion", back_populates="journal", cascade="all, delete-orphan")
+    word_emotions = relationship(
+        "WordEmotion",
+        back_populates="journal",
+        cascade="all, delete-orphan",
+        order_by="WordEmotion.position"
+    )
 
 
 class WordEmotion(Base):
@@ -24,9 +33,33 @@ class WordEmotion(Base):
     text = Column(String)
     emotion = Column(String)
     score = Column(Float)
+    position = Column(Integer)  # token index in the journal text
 
     # ✅ Add ForeignKey linking to JournalEntry
     journal_id = Column(String, ForeignKey("journal_entries.id"))
 
     # ✅ Back-reference to parent journal
     journal = relationship("JournalEntry", back_populates="word_emotions")
+
+
+# Precomputed emotion calendar rows, maintained on every journal write
+class DailyEmotionAggregate(Base):
+    __tablename__ = "daily_emotion_aggregates"
+
+    day = Column(Date, primary_key=True)
+    entry_count = Column(Integer, default=0)
+    dominant_emotion = Column(String)
+    emotion_sums = Column(JSON)
+    stress_sum = Column(Float, default=0.0)
+    stress_count = Column(Integer, default=0)
+
+
+class MonthlyEmotionAggregate(Base):
+    __tablename__ = "monthly_emotion_aggregates"
+
+    month = Column(String, primary_key=True)  # "YYYY-MM"
+    entry_count = Column(Integer, default=0)
+    dominant_emotion = Column(String)
+    emotion_sums = Column(JSON)
+    stress_sum = Column(Float, default=0.0)
+    stress_count = Column(Integer, default=0)
@@ -0,0 +1,97 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+
+class PopupEventHub:
+    """Fans risk-popup events out to Server-Sent Events subscribers, per user.
+
+    `publish` may be called from any thread (the scheduler's workers); each
+    subscriber is an asyncio.Queue fed on its own event loop. The last `history`
+    events per user are kept so a reconnecting client can resume after the id it
+    last saw (the SSE Last-Event-ID header). Wire ids carry the hub's boot time
+    so an id from before a restart is never mistaken for a current one.
+    """
+
+    def __init__(self, history: int = 50, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.boot = int(time.time())
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._history = {}  # username -> deque of events
+        self._history_len = history
+        self._evicted = {}  # username -> id of the newest event dropped from history
+        self._last_id = 0
+        self._subscribers = {}  # username -> set of (loop, queue)
+        self.published = 0
+
+    def publish(self, username: str, event_type: str, data: dict):
+        with self._lock:
+            event = {"id": next(self._ids), "event": event_type, "data": data}
+            self._last_id = event["id"]
+            history = self._history.setdefault(username, deque(maxlen=self._history_len))
+            if len(history) == history.maxlen:
+                self._evicted[username] = history[0]["id"]
+            history.append(event)
+            subscribers = list(self._subscribers.get(username, ()))
+            self.published += 1
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+        return event
+
+    @staticmethod
+    def _offer(queue, event):
+        # A client that stops reading loses its oldest events rather than growing the queue
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def subscribe(self, username: str, last_event_id: int = None):
+        """Register a subscriber on the running loop; returns (queue, missed events or None).
+
+        Missed events are None when `last_event_id` is older than the kept history
+        (or from before a restart), in which case the caller should send a snapshot.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(username, set()).add((asyncio.get_running_loop(), queue))
+            history = list(self._history.get(username, ()))
+            resumable = last_event_id is not None and \
+                self._evicted.get(username, 0) <= last_event_id <= self._last_id
+        if not resumable:
+            return queue, None
+        return queue, [event for event in history if event["id"] > last_event_id]
+
+    def unsubscribe(self, username: str, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(username, set())
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(username, None)
+
+    def snapshot(self, data: dict):
+        """Current state for a client that cannot resume; carries the newest id so it can from then on."""
+        with self._lock:
+            return {"id": self._last_id, "event": "snapshot", "data": data}
+
+    def parse_event_id(self, raw):
+        """Turn a Last-Event-ID value back into an event id; None if it is from another boot."""
+        boot, _, seq = (raw or "").partition("-")
+        if boot != str(self.boot) or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def format_sse(self, event) -> str:
+        data = json.dumps(event["data"], default=str)
+        return f"id: {self.boot}-{event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+            }
+
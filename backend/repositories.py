@@ -0,0 +1,245 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from .util.dynamo_utils import convert_floats_to_decimal
+
+# Blocking DynamoDB calls made from async routes run on this many threads at most
+DYNAMO_EXECUTOR_WORKERS = int(os.getenv("DYNAMO_EXECUTOR_WORKERS", "16"))
+# "dynamodb" for the real tables, "memory" for the in-process stand-in used in tests
+DATA_BACKEND = os.getenv("DATA_BACKEND", "dynamodb")
+
+# (partition key, sort key) per table
+TABLE_KEYS = {
+    "UserEmotionLogs": ("user_id", "timestamp"),
+    "HabitFlowProgress": ("user_id", "habit_id"),
+    "UserHealthData": ("user_id", "date"),
+    "ChatMemory": ("user_id", "timestamp"),
+}
+
+
+# ---------- Table stores (blocking) ----------
+
+class DynamoTableStore:
+    def __init__(self, table):
+        self.table = table
+
+    def put_item(self, item):
+        self.table.put_item(Item=item)
+
+    def get_item(self, key):
+        return self.table.get_item(Key=key).get("Item")
+
+    def query(self, key_condition, filter=None, descending=False, limit=None):
+        kwargs = {"KeyConditionExpression": key_condition, "ScanIndexForward": not descending}
+        if filter is not None:
+            kwargs["FilterExpression"] = filter
+        elif limit:
+            kwargs["Limit"] = limit  # DynamoDB applies Limit before filtering, so only without one
+        items = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response or (limit and len(items) >= limit):
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        return items[:limit] if limit else items
+
+    def update_many(self, keys, values):
+        """SET `values` on every key, one TransactWriteItems call per 100 items."""
+        from boto3.dynamodb.types import TypeSerializer
+        serializer = TypeSerializer()
+        update = ", ".join(f"#{name} = :{name}" for name in values)
+        names = {f"#{name}": name for name in values}
+        typed_values = {f":{name}": serializer.serialize(value) for name, value in values.items()}
+        for start in range(0, len(keys), 100):
+            self.table.meta.client.transact_write_items(TransactItems=[
+                {
+                    "Update": {
+                        "TableName": self.table.name,
+                        "Key": {k: serializer.serialize(v) for k, v in key.items()},
+                        "UpdateExpression": f"SET {update}",
+                        "ExpressionAttributeNames": names,
+                        "ExpressionAttributeValues": typed_values,
+                    }
+                }
+                for key in keys[start:start + 100]
+            ])
+
+
+_MISSING = object()
+
+def evaluate_condition(condition, item):
+    """Evaluate a boto3 Key/Attr condition against a plain dict, for the in-memory store."""
+    expression = condition.get_expression()
+    operator, values = expression["operator"], expression["values"]
+    if operator == "AND":
+        return all(evaluate_condition(v, item) for v in values)
+    if operator == "OR":
+        return any(evaluate_condition(v, item) for v in values)
+    if operator == "NOT":
+        return not evaluate_condition(values[0], item)
+
+    value = item.get(values[0].name, _MISSING)
+    if operator == "attribute_exists":
+        return value is not _MISSING
+    if operator == "attribute_not_exists":
+        return value is _MISSING
+    if value is _MISSING:
+        return False
+    if operator == "=":
+        return value == values[1]
+    if operator == "<>":
+        return value != values[1]
+    if operator == "<":
+        return value < values[1]
+    if operator == "<=":
+        return value <= values[1]
+    if operator == ">":
+        return value > values[1]
+    if operator == ">=":
+        return value >= values[1]
+    if operator == "BETWEEN":
+        return values[1] <= value <= values[2]
+    if operator == "begins_with":
+        return str(value).startswith(values[1])
+    raise ValueError(f"Unsupported condition operator: {operator}")
+
+
+class InMemoryTableStore:
+    """Dict-backed stand-in for a DynamoDB table with the same store interface."""
+
+    def __init__(self, partition_key, sort_key):
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def _key(self, item):
+        return item[self.partition_key], item[self.sort_key]
+
+    def put_item(self, item):
+        with self._lock:
+            self.items[self._key(item)] = dict(item)
+
+    def get_item(self, key):
+        with self._lock:
+            item = self.items.get(self._key(key))
+        return dict(item) if item else None
+
+    def query(self, key_condition, filter=None, descending=False, limit=None):
+        with self._lock:
+            items = [dict(item) for item in self.items.values()]
+        items = [item for item in items if evaluate_condition(key_condition, item)]
+        items.sort(key=lambda item: item[self.sort_key], reverse=descending)
+        if filter is not None:
+            items = [item for item in items if evaluate_condition(filter, item)]
+        return items[:limit] if limit else items
+
+    def update_many(self, keys, values):
+        with self._lock:
+            for key in keys:
+                item = self.items.setdefault(self._key(key), dict(key))
+                item.update(values)
+
+
+# ---------- Async repositories ----------
+
+class Repository:
+    def __init__(self, store, executor):
+        self.store = store
+        self.executor = executor
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+
+class EmotionLogRepository(Repository):
+    async def log(self, user_id, emotion, stress, message):
+        await self._run(self.store.put_item, convert_floats_to_decimal({
+            "user_id": user_id,
+            "timestamp": datetime.utcnow().isoformat(),
+            "emotion": emotion,
+            "stress": stress,
+            "message": message,
+        }))
+
+
+class HabitProgressRepository(Repository):
+    async def pending_today(self, user_id, today):
+        """Active habits for one user whose last_completed is not `today`."""
+        return await self._run(
+            self.store.query,
+            Key("user_id").eq(user_id),
+            filter=Attr("is_active").eq(True) & (
+                Attr("last_completed").not_exists() | Attr("last_completed").ne(today)
+            ),
+        )
+
+    async def mark_completed(self, habits, day):
+        keys = [{"user_id": h["user_id"], "habit_id": h["habit_id"]} for h in habits]
+        if keys:
+            await self._run(self.store.update_many, keys, {"last_completed": day})
+
+
+class HealthDataRepository(Repository):
+    async def save(self, user_id, date, sleep, hrv):
+        await self._run(self.store.put_item, convert_floats_to_decimal({
+            "user_id": user_id,
+            "date": date,
+            "sleep": sleep,
+            "hrv": hrv,
+        }))
+
+
+class ChatMemoryRepository(Repository):
+    async def recent_turns(self, user_id, limit=6):
+        """Latest `limit` turns for a user, oldest first."""
+        items = await self._run(self.store.query, Key("user_id").eq(user_id), descending=True, limit=limit)
+        return sorted(items, key=lambda x: x["timestamp"])
+
+    async def append(self, user_id, role, content, timestamp=None):
+        await self._run(self.store.put_item, {
+            "user_id": user_id,
+            "timestamp": timestamp or datetime.utcnow().isoformat(),
+            "message_role": role,
+            "content": content,
+        })
+
+
+class Repositories:
+    def __init__(self, backend: str = DATA_BACKEND, max_workers: int = DYNAMO_EXECUTOR_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dynamo")
+        if backend == "memory":
+            stores = {name: InMemoryTableStore(*keys) for name, keys in TABLE_KEYS.items()}
+        elif backend == "dynamodb":
+            import boto3
+            dynamodb = boto3.resource("dynamodb", region_name="ap-south-1")
+            stores = {name: DynamoTableStore(dynamodb.Table(name)) for name in TABLE_KEYS}
+        else:
+            raise ValueError(f"Unknown DATA_BACKEND: {backend}")
+
+        self.emotion_logs = EmotionLogRepository(stores["UserEmotionLogs"], self.executor)
+        self.habits = HabitProgressRepository(stores["HabitFlowProgress"], self.executor)
+        self.health = HealthDataRepository(stores["UserHealthData"], self.executor)
+        self.chat_memory = ChatMemoryRepository(stores["ChatMemory"], self.executor)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+_repositories = None
+_repositories_lock = threading.Lock()
+
+def get_repositories() -> Repositories:
+    global _repositories
+    with _repositories_lock:
+        if _repositories is None:
+            _repositories = Repositories()
+        return _repositories
@@ -0,0 +1,200 @@
+"""In-process BM25 retrieval over the coping-strategies corpus.
+
+The index is built once into a flat binary file and memory-mapped at startup;
+postings are read straight from the mapping at query time. Rebuild it with:
+
+    python -m backend.retrieval --build
+    python -m backend.retrieval --query "can't sleep, mind racing"
+"""
+import argparse
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+CORPUS_PATH = os.getenv("RETRIEVAL_CORPUS_PATH", os.path.join(DATA_DIR, "coping_corpus.jsonl"))
+INDEX_PATH = os.getenv("RETRIEVAL_INDEX_PATH", os.path.join(DATA_DIR, "coping_index.bin"))
+
+# Packed layout (little endian):
+#   b"BM" version:u8 | n_docs:u32 | n_terms:u32 | avgdl:f32 | docs_offset:u32 | docs_len:u32
+#   doc_lengths:u32[n_docs]
+#   n_terms x (len:u8, utf-8 term, df:u32, postings_offset:u32)
+#   postings: per term, doc ids u32[df] then term frequencies u16[df]
+#   docs: utf-8 JSON list of {"id", "title", "text"}
+MAGIC = b"BM"
+VERSION = 1
+HEADER = struct.Struct("<2sBIIfII")
+
+K1 = 1.5
+B = 0.75
+
+STOPWORDS = set("""
+a an and are as at be been but by can do does for from had has have how i i'm if in into is it its
+just me my of on or so that the their them then there these they this to too up was we were what
+when which who will with you your feel feeling really very
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def stem(word: str) -> str:
+    # Light suffix stripping so "worries"/"worry" and "sleeping"/"sleep" meet
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str):
+    return [stem(w) for w in _TOKEN.findall(text.lower().replace("’", "'")) if w not in STOPWORDS]
+
+
+def load_corpus(path: str = CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_index(docs, index_path: str = INDEX_PATH):
+    doc_terms = [Counter(tokenize(f"{d.get('title', '')} {d['text']}")) for d in docs]
+    doc_lengths = [sum(terms.values()) for terms in doc_terms]
+    postings = defaultdict(list)
+    for doc_id, terms in enumerate(doc_terms):
+        for term, tf in terms.items():
+            postings[term].append((doc_id, min(tf, 0xFFFF)))
+
+    terms = sorted(postings)
+    term_table, blocks, offset = [], [], 0
+    for term in terms:
+        plist = postings[term]
+        encoded = term.encode("utf-8")[:255]
+        term_table.append(struct.pack("<B", len(encoded)) + encoded + struct.pack("<II", len(plist), offset))
+        block = struct.pack(f"<{len(plist)}I", *(d for d, _ in plist)) + struct.pack(f"<{len(plist)}H", *(tf for _, tf in plist))
+        blocks.append(block)
+        offset += len(block)
+
+    docs_blob = json.dumps([{"id": d["id"], "title": d.get("title", ""), "text": d["text"]} for d in docs]).encode("utf-8")
+    body = struct.pack(f"<{len(docs)}I", *doc_lengths) + b"".join(term_table)
+    postings_start = HEADER.size + len(body)
+    docs_offset = postings_start + offset
+    avgdl = sum(doc_lengths) / len(docs) if docs else 0.0
+
+    # A private temp file per build, so workers rebuilding at once never write into each other's
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(index_path)),
+                                     prefix=os.path.basename(index_path) + ".", suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+        try:
+            f.write(HEADER.pack(MAGIC, VERSION, len(docs), len(terms), avgdl, docs_offset, len(docs_blob)))
+            f.write(body)
+            f.write(b"".join(blocks))
+            f.write(docs_blob)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def ensure_index(corpus_path: str = CORPUS_PATH, index_path: str = INDEX_PATH):
+    """Build the index if it is missing or older than the corpus."""
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(corpus_path):
+        build_index(load_corpus(corpus_path), index_path)
+        print(f"📚 Built retrieval index at {index_path}")
+    return index_path
+
+
+class LocalRetriever:
+    """BM25 search over a memory-mapped index written by `build_index`."""
+
+    def __init__(self, index_path: str = INDEX_PATH):
+        self._file = open(index_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_docs, n_terms, avgdl, docs_offset, docs_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Unknown retrieval index format")
+
+        offset = HEADER.size
+        doc_lengths = struct.unpack_from(f"<{n_docs}I", self._mm, offset)
+        offset += 4 * n_docs
+        # BM25 length normalisation per document, computed once
+        self._norms = [K1 * (1 - B + B * dl / avgdl) if avgdl else K1 for dl in doc_lengths]
+
+        self._terms = {}
+        for _ in range(n_terms):
+            length = self._mm[offset]
+            term = self._mm[offset + 1:offset + 1 + length].decode("utf-8")
+            df, postings_offset = struct.unpack_from("<II", self._mm, offset + 1 + length)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            self._terms[term] = (df, postings_offset, idf)
+            offset += 1 + length + 8
+        self._postings_start = offset
+        self.docs = json.loads(self._mm[docs_offset:docs_offset + docs_len].decode("utf-8"))
+
+    def search(self, query: str, k: int = 3):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            entry = self._terms.get(term)
+            if entry is None:
+                continue
+            df, postings_offset, idf = entry
+            start = self._postings_start + postings_offset
+            doc_ids = struct.unpack_from(f"<{df}I", self._mm, start)
+            tfs = struct.unpack_from(f"<{df}H", self._mm, start + 4 * df)
+            for doc_id, tf in zip(doc_ids, tfs):
+                scores[doc_id] += idf * tf * (K1 + 1) / (tf + self._norms[doc_id])
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [{**self.docs[doc_id], "score": round(score, 3)} for doc_id, score in best]
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+def get_retriever() -> LocalRetriever:
+    global _retriever
+    with _retriever_lock:
+        if _retriever is None:
+            _retriever = LocalRetriever(ensure_index())
+        return _retriever
+
+
+def format_passages(passages) -> str:
+    return "\n".join(f"- {p['title']}: {p['text']}" for p in passages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--build", action="store_true", help="rebuild the index even if it is up to date")
+    parser.add_argument("--query", help="print the top passages for this query")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.build:
+        build_index(load_corpus(args.corpus), args.index)
+        print(f"📚 Built retrieval index at {args.index}")
+    if args.query:
+        retriever = LocalRetriever(ensure_index(args.corpus, args.index))
+        started = time.perf_counter()
+        passages = retriever.search(args.query, args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for p in passages:
+            print(f"{p['score']:7.3f}  {p['title']}")
+        print(f"⏱️ {elapsed:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
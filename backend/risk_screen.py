@@ -0,0 +1,90 @@
+import hashlib
+import re
+import threading
+
+# Phrases that always go to the LLM, whatever their sentiment score
+CRISIS_PHRASES = [
+    "suicide", "suicidal", "kill myself", "end my life", "end it all", "want to die",
+    "wish i was dead", "wish i were dead", "better off dead", "self harm", "self-harm",
+    "hurt myself", "cut myself", "no reason to live", "can't go on", "cant go on",
+    "hopeless", "worthless", "disappear forever", "give up on everything",
+    # Indirect warning signs that carry little negative sentiment for VADER to see
+    "pointless", "no future", "see a future", "a burden", "won't be needing", "wont be needing",
+    "sleep forever", "sleeping forever", "pills", "still be around", "say goodbye",
+]
+CRISIS_RE = re.compile("|".join(re.escape(p) for p in CRISIS_PHRASES), re.IGNORECASE)
+# Changes whenever the phrase list does, so verdicts from an older lexicon can be told apart
+LEXICON_VERSION = hashlib.sha1("\n".join(CRISIS_PHRASES).encode("utf-8")).hexdigest()[:8]
+
+
+class RiskScreen:
+    """Stage 1 of the risk cascade: a VADER lexicon screen in front of Granite.
+
+    Each text gets a score in [0, 1]: 1.0 on a crisis phrase, otherwise the larger
+    of VADER's negative share and its negated compound score. Only texts scoring
+    at or above `threshold` are escalated to the LLM. Without vaderSentiment
+    installed the screen escalates everything. `version` names the threshold and
+    lexicon a verdict was reached with.
+    """
+
+    def __init__(self, threshold: float = 0.15):
+        self.threshold = threshold
+        self.version = f"{LEXICON_VERSION}@{threshold}"
+        self._analyzer = None
+        self._analyzer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.screened = 0
+        self.escalated = 0
+        self.llm_scored = 0
+        self.llm_flagged = 0
+
+    def _get_analyzer(self):
+        with self._analyzer_lock:
+            if self._analyzer is None:
+                try:
+                    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+                    self._analyzer = SentimentIntensityAnalyzer()
+                except ImportError:
+                    print("⚠️ vaderSentiment not installed; every text goes to the risk model")
+                    self._analyzer = False
+            return self._analyzer
+
+    def scores(self, texts):
+        analyzer = self._get_analyzer()
+        if not analyzer:
+            return [1.0] * len(texts)
+        polarity = analyzer.polarity_scores
+        result = []
+        for text in texts:
+            if CRISIS_RE.search(text):
+                result.append(1.0)
+                continue
+            sentiment = polarity(text)
+            result.append(round(min(1.0, max(sentiment["neg"], -sentiment["compound"], 0.0)), 3))
+        return result
+
+    def screen(self, texts):
+        """Return (scores, escalate flags) for a batch and count it in the stage 1 stats."""
+        scores = self.scores(texts)
+        escalate = [score >= self.threshold for score in scores]
+        with self._stats_lock:
+            self.screened += len(texts)
+            self.escalated += sum(escalate)
+        return scores, escalate
+
+    def record_llm_results(self, probabilities, flag_at: float = 0.85):
+        with self._stats_lock:
+            self.llm_scored += len(probabilities)
+            self.llm_flagged += sum(1 for p in probabilities if p > flag_at)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "threshold": self.threshold,
+                "screened": self.screened,
+                "escalated": self.escalated,
+                "screen_pass_rate": round(self.escalated / self.screened, 3) if self.screened else None,
+                "llm_scored": self.llm_scored,
+                "llm_flagged": self.llm_flagged,
+                "llm_flag_rate": round(self.llm_flagged / self.llm_scored, 3) if self.llm_scored else None,
+            }
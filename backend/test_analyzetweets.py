@@ -0,0 +1,250 @@
+from datetime import datetime, timedelta
+
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+
+from . import analyzetweets
+from .risk_screen import RiskScreen
+from .twitter_client import FakeTwitterSession, TwitterClient
+
+
+class FakeAnalysisTable:
+    """TweetRiskAnalysis stand-in that honours store_analysis's put condition."""
+
+    def __init__(self):
+        self.items = {}
+        self.puts = 0
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None):
+        existing = self.items.get(Item["tweet_id"])
+        if existing is not None and not (
+            existing.get("screen_only") and existing.get("screen_version") != ExpressionAttributeValues[":version"]
+        ):
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")
+        self.items[Item["tweet_id"]] = dict(Item)
+        self.puts += 1
+        return {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key["tweet_id"])
+        return {"Item": dict(item)} if item else {}
+
+
+class FakeCursorTable:
+    def __init__(self, missing=False):
+        self.missing = missing
+        self.items = {}
+
+    def _check(self, operation):
+        if self.missing:
+            raise ClientError({"Error": {"Code": "ResourceNotFoundException"}}, operation)
+
+    def get_item(self, Key):
+        self._check("GetItem")
+        item = self.items.get(Key["username"])
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, Item):
+        self._check("PutItem")
+        self.items[Item["username"]] = dict(Item)
+
+
+class FakeUsersTable:
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, Item):
+        self.items[Item["username"]] = dict(Item)
+
+    def delete_item(self, Key):
+        self.items.pop(Key["username"], None)
+
+    def scan(self, **kwargs):
+        return {"Items": [{"username": username} for username in self.items]}
+
+
+class FakeDynamo:
+    def __init__(self):
+        self.table = FakeAnalysisTable()
+        self.cursors = FakeCursorTable()
+        self.users = FakeUsersTable()
+
+    def Table(self, name):
+        if name == analyzetweets.POLL_CURSOR_TABLE:
+            return self.cursors
+        if name == analyzetweets.MONITORED_USERS_TABLE:
+            return self.users
+        return self.table
+
+    def batch_get_item(self, RequestItems):
+        keys = RequestItems["TweetRiskAnalysis"]["Keys"]
+        found = [dict(self.table.items[k["tweet_id"]]) for k in keys if k["tweet_id"] in self.table.items]
+        return {"Responses": {"TweetRiskAnalysis": found}}
+
+
+def clearing_screen(threshold=0.15):
+    screen = RiskScreen(threshold=threshold)
+    screen.scores = lambda texts: [0.0] * len(texts)
+    return screen
+
+
+@pytest.fixture
+def dynamo(monkeypatch):
+    fake = FakeDynamo()
+    monkeypatch.setattr(analyzetweets, "dynamodb", fake)
+    monkeypatch.setattr(analyzetweets, "risk_screen", clearing_screen())
+    return fake
+
+
+def test_screen_cleared_tweet_is_a_cache_hit_while_the_screen_is_unchanged(dynamo):
+    [result] = analyzetweets.score_tweets([("1", "lovely walk today", "2026-10-01T10:00:00.000Z")])
+    assert result["screen_only"] and result["risk_detected"] == "No"
+
+    existing = analyzetweets.fetch_existing_analyses(["1"])
+    assert list(existing) == ["1"]
+    assert analyzetweets.analysis_from_item(existing["1"])["screen_only"]
+    assert analyzetweets.analyze_tweet("1", "lovely walk today", "2026-10-01T10:00:00.000Z")["screen_only"]
+    assert dynamo.table.puts == 1
+
+
+def test_screen_cleared_tweet_is_rescreened_after_the_threshold_changes(dynamo, monkeypatch):
+    analyzetweets.score_tweets([("1", "lovely walk today", "2026-10-01T10:00:00.000Z")])
+    monkeypatch.setattr(analyzetweets, "risk_screen", clearing_screen(threshold=0.3))
+
+    assert analyzetweets.fetch_existing_analyses(["1"]) == {}
+    analyzetweets.score_tweets([("1", "lovely walk today", "2026-10-01T10:00:00.000Z")])
+    assert dynamo.table.puts == 2
+    assert dynamo.table.items["1"]["screen_version"] == analyzetweets.risk_screen.version
+
+
+def test_granite_verdict_is_never_overwritten(dynamo):
+    parsed = {"harm": "Yes", "confidence": "0.9", "comment": "risky"}
+    analyzetweets.store_scored_tweet("1", "text", "2026-10-01T10:00:00.000Z", parsed)
+    analyzetweets.store_scored_tweet("1", "text", "2026-10-01T10:00:00.000Z", parsed,
+                                     screen_version=analyzetweets.risk_screen.version)
+
+    assert dynamo.table.puts == 1
+    assert "screen_only" not in dynamo.table.items["1"]
+    assert list(analyzetweets.fetch_existing_analyses(["1"])) == ["1"]
+
+
+def tweet(tweet_id, minutes_ago):
+    created_at = datetime.utcnow() - timedelta(minutes=minutes_ago)
+    return {"id": str(tweet_id), "text": f"tweet {tweet_id}", "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.000Z")}
+
+
+@pytest.fixture
+def twitter(monkeypatch):
+    session = FakeTwitterSession(users={"someone": "42"}, tweets={"42": [tweet(i, 100 - i) for i in range(30, 0, -1)]})
+    monkeypatch.setattr(analyzetweets, "twitter_client", TwitterClient("token", session=session))
+    return session
+
+
+def fake_scoring(monkeypatch, failing=()):
+    scored = []
+
+    def score_tweets(tweets, user_id=None):
+        scored.extend(tweet_id for tweet_id, _, _ in tweets)
+        return [
+            analyzetweets.unknown_analysis(text) if tweet_id in failing
+            else {"text": text, "risk_detected": "No", "confidence": "0.1", "probability_of_risk": 0.1}
+            for tweet_id, text, _ in tweets
+        ]
+
+    monkeypatch.setattr(analyzetweets, "score_tweets", score_tweets)
+    return scored
+
+
+def test_cursor_moves_to_the_newest_tweet_and_the_next_poll_pages_from_it(dynamo, twitter, monkeypatch):
+    dynamo.cursors.items["someone"] = {"username": "someone", "newest_id": "5"}
+    scored = fake_scoring(monkeypatch)
+
+    analyzetweets.scheduled_check("someone")
+
+    assert sorted(scored, key=int) == [str(i) for i in range(6, 31)]
+    assert dynamo.cursors.items["someone"]["newest_id"] == "30"
+
+
+def test_cursor_stays_below_the_oldest_failed_tweet(dynamo, twitter, monkeypatch):
+    dynamo.cursors.items["someone"] = {"username": "someone", "newest_id": "5"}
+    fake_scoring(monkeypatch, failing={"12", "20"})
+
+    analyzetweets.scheduled_check("someone")
+    assert dynamo.cursors.items["someone"]["newest_id"] == "11"
+
+    scored = fake_scoring(monkeypatch)
+    analyzetweets.scheduled_check("someone")
+    assert "12" in scored and "20" in scored
+    assert dynamo.cursors.items["someone"]["newest_id"] == "30"
+
+
+def test_missing_cursor_table_does_not_stop_monitoring(dynamo, twitter, monkeypatch):
+    dynamo.cursors.missing = True
+    scored = fake_scoring(monkeypatch)
+
+    analyzetweets.scheduled_check("someone")
+
+    assert len(scored) == 10  # no cursor: the latest page, as before cursors existed
+    assert analyzetweets.get_popup_state("someone")["last_checked"] is not None
+
+
+def test_monitor_endpoints_are_disabled_without_an_admin_token(dynamo, monkeypatch):
+    monkeypatch.setattr(analyzetweets, "MONITOR_ADMIN_TOKEN", None)
+    client = TestClient(analyzetweets.app)
+
+    assert client.post("/api/monitor/someone", headers={"X-Admin-Token": "anything"}).status_code == 403
+    assert dynamo.users.items == {}
+
+
+def test_monitor_opt_in_needs_the_token_and_is_persisted(dynamo, monkeypatch):
+    monkeypatch.setattr(analyzetweets, "MONITOR_ADMIN_TOKEN", "secret")
+    client = TestClient(analyzetweets.app)
+
+    assert client.post("/api/monitor/someone").status_code == 401
+    assert client.post("/api/monitor/someone", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.post("/api/monitor/someone", headers={"X-Admin-Token": "secret"}).status_code == 200
+    assert analyzetweets.load_opted_in_users() == ["someone"]
+    assert analyzetweets.scheduler.get_job("risk_check:someone") is not None
+
+    assert client.delete("/api/monitor/someone", headers={"X-Admin-Token": "secret"}).status_code == 200
+    assert analyzetweets.load_opted_in_users() == []
+    assert analyzetweets.scheduler.get_job("risk_check:someone") is None
+
+
+class ThrottlingDynamo(FakeDynamo):
+    """Leaves every key unprocessed on the first `throttled_calls` BatchGetItem calls."""
+
+    def __init__(self, throttled_calls):
+        super().__init__()
+        self.throttled_calls = throttled_calls
+        self.batch_calls = 0
+
+    def batch_get_item(self, RequestItems):
+        self.batch_calls += 1
+        if self.batch_calls <= self.throttled_calls:
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+        return super().batch_get_item(RequestItems)
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(analyzetweets.time, "sleep", lambda seconds: None)
+
+
+def test_unprocessed_keys_are_retried(monkeypatch, no_sleep):
+    fake = ThrottlingDynamo(throttled_calls=2)
+    fake.table.items["1"] = {"tweet_id": "1", "text": "t"}
+    monkeypatch.setattr(analyzetweets, "dynamodb", fake)
+
+    assert list(analyzetweets.fetch_existing_analyses(["1"])) == ["1"]
+    assert fake.batch_calls == 3
+
+
+def test_sustained_throttling_gives_up_and_treats_keys_as_misses(monkeypatch, no_sleep):
+    fake = ThrottlingDynamo(throttled_calls=1000)
+    fake.table.items["1"] = {"tweet_id": "1", "text": "t"}
+    monkeypatch.setattr(analyzetweets, "dynamodb", fake)
+
+    assert analyzetweets.fetch_existing_analyses(["1"]) == {}
+    assert fake.batch_calls == analyzetweets.BATCH_GET_MAX_RETRIES + 1
@@ -0,0 +1,82 @@
+import json
+import os
+
+from .dynamo_sink import DynamoWriteBehind
+
+
+class FakeBatchWriter:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.table.fail:
+            raise RuntimeError("throttled")
+
+    def put_item(self, Item):
+        self.table.items.append(Item)
+
+
+class FakeTable:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.items = []
+
+    def batch_writer(self):
+        return FakeBatchWriter(self)
+
+
+def write_lines(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+def test_replay_writes_spooled_items_then_removes_the_replay_file(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    write_lines(spool, [json.dumps({"id": i}) + "\n" for i in range(3)])
+
+    table = FakeTable()
+    sink = DynamoWriteBehind(table, spool, flush_interval=0.05)
+    assert not os.path.exists(spool)
+    sink.close()
+
+    assert sorted(item["id"] for item in table.items) == [0, 1, 2]
+    assert not os.path.exists(spool + ".replay")
+
+
+def test_replay_picks_up_a_replay_cut_short_by_a_crash(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    write_lines(spool + ".replay", [json.dumps({"id": "old"}) + "\n"])
+    write_lines(spool, [json.dumps({"id": "new"}) + "\n"])
+
+    table = FakeTable()
+    DynamoWriteBehind(table, spool, flush_interval=0.05).close()
+
+    assert sorted(item["id"] for item in table.items) == ["new", "old"]
+    assert not os.path.exists(spool) and not os.path.exists(spool + ".replay")
+
+
+def test_torn_spool_line_is_quarantined_instead_of_failing_startup(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    write_lines(spool, [json.dumps({"id": 1}) + "\n", '{"id": 2, "te'])
+
+    table = FakeTable()
+    DynamoWriteBehind(table, spool, flush_interval=0.05).close()
+
+    assert [item["id"] for item in table.items] == [1]
+    with open(spool + ".bad", encoding="utf-8") as f:
+        assert f.read() == '{"id": 2, "te\n'
+
+
+def test_failed_replay_goes_back_to_the_spool(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    write_lines(spool, [json.dumps({"id": 9}) + "\n"])
+
+    sink = DynamoWriteBehind(FakeTable(fail=True), spool, flush_interval=0.05, max_retries=0)
+    sink.close()
+
+    with open(spool, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [{"id": 9}]
+    assert not os.path.exists(spool + ".replay")
@@ -0,0 +1,71 @@
+import threading
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from . import models
+from .emotion_aggregates import read_calendar, record_journal_emotions
+
+DAY = date(2026, 10, 1)
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'journal.db'}",
+                           connect_args={"check_same_thread": False, "timeout": 30})
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def record(sessions, emotions, stress_score=None, previous_emotions=None):
+    db = sessions()
+    try:
+        record_journal_emotions(db, DAY, emotions, stress_score, previous_emotions=previous_emotions)
+        db.commit()
+    finally:
+        db.close()
+
+
+def month(sessions):
+    db = sessions()
+    try:
+        return read_calendar(db, DAY, DAY, "month")
+    finally:
+        db.close()
+
+
+def test_concurrent_entries_in_a_new_month_are_all_counted(sessions):
+    threads = [
+        threading.Thread(target=record, args=(sessions, [{"emotion": "joy", "score": 1.0}], 0.5))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    [row] = month(sessions)
+    assert row["entry_count"] == 20
+    assert row["emotion_means"] == {"joy": 1.0}
+    assert row["stress_score"] == 0.5
+
+
+def test_entries_without_a_stress_score_leave_the_stress_mean_alone(sessions):
+    record(sessions, [{"emotion": "joy", "score": 1.0}], 0.8)
+    record(sessions, [{"emotion": "sadness", "score": 1.0}], None)
+
+    [row] = month(sessions)
+    assert row["entry_count"] == 2
+    assert row["stress_score"] == 0.8
+
+
+def test_edit_replaces_the_previous_emotions(sessions):
+    record(sessions, [{"emotion": "joy", "score": 0.9}])
+    record(sessions, [{"emotion": "anger", "score": 0.7}], previous_emotions=[{"emotion": "joy", "score": 0.9}])
+
+    [row] = month(sessions)
+    assert row["entry_count"] == 1
+    assert row["dominant_emotion"] == "anger"
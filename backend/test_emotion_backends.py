@@ -0,0 +1,43 @@
+import threading
+
+from .emotion_backends import HuggingFaceAPIBackend, MicroBatcher, StubEmotionBackend, create_emotion_backend
+
+
+class CountingBackend(StubEmotionBackend):
+    def __init__(self):
+        self.calls = []
+
+    def classify(self, texts):
+        self.calls.append(list(texts))
+        return super().classify(texts)
+
+
+def test_hosted_backend_is_not_micro_batched():
+    backend = create_emotion_backend("huggingface", api_url="https://example.test/models/m", api_token="t")
+    assert isinstance(backend, HuggingFaceAPIBackend)
+
+
+def test_stub_backend_is_not_micro_batched():
+    assert isinstance(create_emotion_backend("stub"), StubEmotionBackend)
+
+
+def test_micro_batcher_merges_concurrent_calls_and_runs_shared_texts_once():
+    inner = CountingBackend()
+    batcher = MicroBatcher(inner, max_wait_ms=50)
+    results = {}
+
+    def classify(name, texts):
+        results[name] = batcher.classify(texts)
+
+    threads = [
+        threading.Thread(target=classify, args=("a", ["happy", "today"])),
+        threading.Thread(target=classify, args=("b", ["today", "sad"])),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(text for call in inner.calls for text in call) == ["happy", "sad", "today"]
+    assert results["a"] == StubEmotionBackend().classify(["happy", "today"])
+    assert results["b"] == StubEmotionBackend().classify(["today", "sad"])
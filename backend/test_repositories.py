@@ -0,0 +1,37 @@
+import asyncio
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from .repositories import InMemoryTableStore, Repositories
+
+
+def test_in_memory_query_applies_key_condition_filter_order_and_limit():
+    store = InMemoryTableStore("user_id", "timestamp")
+    for i in range(5):
+        store.put_item({"user_id": "u", "timestamp": f"2026-10-0{i + 1}", "kind": "a" if i % 2 else "b"})
+    store.put_item({"user_id": "other", "timestamp": "2026-10-09", "kind": "a"})
+
+    newest = store.query(Key("user_id").eq("u"), descending=True, limit=2)
+    assert [item["timestamp"] for item in newest] == ["2026-10-05", "2026-10-04"]
+
+    filtered = store.query(Key("user_id").eq("u"), filter=Attr("kind").eq("a"))
+    assert [item["timestamp"] for item in filtered] == ["2026-10-02", "2026-10-04"]
+
+
+def test_pending_habits_and_mark_completed_on_the_memory_backend():
+    repos = Repositories(backend="memory", max_workers=2)
+    habits = repos.habits.store
+    habits.put_item({"user_id": "u", "habit_id": "walk", "is_active": True})
+    habits.put_item({"user_id": "u", "habit_id": "read", "is_active": True, "last_completed": "2026-10-18"})
+    habits.put_item({"user_id": "u", "habit_id": "old", "is_active": False})
+
+    async def scenario():
+        pending = await repos.habits.pending_today("u", "2026-10-18")
+        assert [h["habit_id"] for h in pending] == ["walk"]
+        await repos.habits.mark_completed(pending, "2026-10-18")
+        return await repos.habits.pending_today("u", "2026-10-18")
+
+    try:
+        assert asyncio.run(scenario()) == []
+    finally:
+        repos.close()
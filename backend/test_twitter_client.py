@@ -0,0 +1,28 @@
+from .twitter_client import FakeTwitterSession, TwitterClient
+
+
+def make_client(n_tweets=25):
+    tweets = [
+        {"id": str(i), "text": f"tweet {i}", "created_at": "2026-10-01T10:00:00.000Z"}
+        for i in range(n_tweets, 0, -1)
+    ]
+    session = FakeTwitterSession(users={"someone": "42"}, tweets={"42": tweets})
+    return TwitterClient("token", session=session), session
+
+
+def test_since_id_pages_until_next_token_runs_out():
+    client, session = make_client()
+
+    tweets = client.get_user_tweets("42", max_results=10, since_id="3")
+
+    assert [t["id"] for t in tweets] == [str(i) for i in range(25, 3, -1)]
+    assert [params.get("pagination_token") for _, params in session.calls] == [None, "10", "20"]
+
+
+def test_without_since_id_only_the_latest_page_is_read():
+    client, session = make_client()
+
+    tweets = client.get_user_tweets("42", max_results=10)
+
+    assert [t["id"] for t in tweets] == [str(i) for i in range(25, 15, -1)]
+    assert len(session.calls) == 1
@@ -0,0 +1,25 @@
+import pytest
+
+from .word_emotion_codec import pack_word_emotions, unpack_word_emotions
+
+
+def test_round_trip_keeps_words_labels_and_scores():
+    text = "Felt  anxious\tthis morning, then calm ☀️"
+    words = text.split()
+    emotions = ["fear", "fear", "neutral", "neutral", "joy", "joy", "joy"][:len(words)]
+    word_emotions = [
+        {"text": word, "emotion": emotion, "score": 0.125 * (i + 1)}
+        for i, (word, emotion) in enumerate(zip(words, emotions))
+    ]
+
+    assert unpack_word_emotions(text, pack_word_emotions(text, word_emotions)) == word_emotions
+
+
+def test_pack_rejects_a_word_count_that_does_not_match_the_text():
+    with pytest.raises(ValueError):
+        pack_word_emotions("two words", [{"text": "two", "emotion": "joy", "score": 0.5}])
+
+
+def test_unpack_rejects_an_unknown_format():
+    with pytest.raises(ValueError):
+        unpack_word_emotions("text", b"XX\x01\x00")
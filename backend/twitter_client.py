@@ -0,0 +1,191 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TWITTER_API_URL = "https://api.twitter.com/2"
+
+
+class TwitterAPIError(Exception):
+    pass
+
+
+class TwitterRateLimited(TwitterAPIError):
+    def __init__(self, endpoint, reset_at):
+        super().__init__(f"Rate limit exhausted for {endpoint} until {time.ctime(reset_at)}")
+        self.endpoint = endpoint
+        self.reset_at = reset_at
+
+
+class TwitterClient:
+    """Keep-alive Twitter v2 client that budgets calls against the rate-limit headers.
+
+    Each endpoint's `x-rate-limit-remaining` / `x-rate-limit-reset` are tracked;
+    once a window is used up, calls wait for the reset when it is close enough
+    (`max_wait` seconds) and raise `TwitterRateLimited` otherwise. Username to id
+    lookups are cached for `user_id_ttl` seconds.
+    """
+
+    def __init__(self, bearer_token: str, base_url: str = TWITTER_API_URL, timeout=(3.05, 10),
+                 pool_size: int = 20, user_id_ttl: float = 24 * 3600, max_wait: float = 30.0, session=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.user_id_ttl = user_id_ttl
+        self.max_wait = max_wait
+
+        if session is None:
+            session = requests.Session()
+            retries = Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        session.headers["Authorization"] = f"Bearer {bearer_token}"
+        self.session = session
+
+        self._lock = threading.Lock()
+        self._budgets = {}  # endpoint -> (remaining, reset_epoch)
+        self._user_ids = {}  # lowercase username -> (user_id, expires_at)
+
+    def get_user_id(self, username: str) -> str:
+        key = username.lower()
+        with self._lock:
+            cached = self._user_ids.get(key)
+        if cached and cached[1] > time.time():
+            return cached[0]
+
+        resp_json = self._get("users/by/username", f"/users/by/username/{username}")
+        if "data" not in resp_json:
+            raise TwitterAPIError(f"User not found or API error: {resp_json}")
+        user_id = resp_json["data"]["id"]
+        with self._lock:
+            self._user_ids[key] = (user_id, time.time() + self.user_id_ttl)
+        return user_id
+
+    def get_user_tweets(self, user_id: str, max_results: int = 5, since_id: str = None):
+        """Latest `max_results` tweets, newest first; with `since_id`, every tweet after it.
+
+        Pages past `since_id` are followed via `meta.next_token` until it runs out,
+        each page budgeted like any other call.
+        """
+        params = {
+            "max_results": max_results,
+            "tweet.fields": "created_at,text",
+        }
+        if since_id:
+            params["since_id"] = since_id
+        tweets = []
+        while True:
+            resp_json = self._get("users/tweets", f"/users/{user_id}/tweets", params)
+            tweets.extend(resp_json.get("data", []))
+            next_token = resp_json.get("meta", {}).get("next_token")
+            if not since_id or not next_token:
+                return tweets
+            params = {**params, "pagination_token": next_token}
+
+    def budget(self):
+        with self._lock:
+            return {
+                endpoint: {"remaining": remaining, "reset_in": max(0, round(reset_at - time.time()))}
+                for endpoint, (remaining, reset_at) in self._budgets.items()
+            }
+
+    def _get(self, endpoint: str, path: str, params=None):
+        for attempt in range(2):
+            self._wait_for_budget(endpoint)
+            response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+            self._record_budget(endpoint, response.headers)
+            if response.status_code != 429:
+                return response.json()
+            # Out of budget anyway (e.g. another worker spent it); the next loop waits or raises
+            with self._lock:
+                _, reset_at = self._budgets.get(endpoint, (0, time.time() + self.max_wait + 1))
+                self._budgets[endpoint] = (0, reset_at)
+        raise TwitterRateLimited(endpoint, reset_at)
+
+    def _wait_for_budget(self, endpoint):
+        with self._lock:
+            remaining, reset_at = self._budgets.get(endpoint, (None, 0))
+            if remaining is not None and remaining > 0:
+                # Reserve a call now so concurrent workers don't overspend the window
+                self._budgets[endpoint] = (remaining - 1, reset_at)
+                return
+        if remaining is None or reset_at <= time.time():
+            return
+        wait = reset_at - time.time()
+        if wait > self.max_wait:
+            raise TwitterRateLimited(endpoint, reset_at)
+        print(f"⏳ Twitter {endpoint} budget used up, waiting {wait:.0f}s for reset")
+        time.sleep(wait)
+
+    def _record_budget(self, endpoint, headers):
+        remaining = headers.get("x-rate-limit-remaining")
+        reset_at = headers.get("x-rate-limit-reset")
+        if remaining is None or reset_at is None:
+            return
+        with self._lock:
+            self._budgets[endpoint] = (int(remaining), float(reset_at))
+
+
+# 🧪 In-memory stand-in for the Twitter API, for tests and offline runs
+class FakeTwitterResponse:
+    def __init__(self, status_code, payload, headers):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers
+
+    def json(self):
+        return self._payload
+
+
+class FakeTwitterSession:
+    """Serves /users/by/username and /users/:id/tweets from dicts, with rate-limit headers.
+
+    `users` maps username -> user id and `tweets` maps user id -> tweets (newest
+    first, each with "id", "text" and "created_at"). Longer results are paged
+    with `meta.next_token` / `pagination_token` like the real API.
+    """
+
+    def __init__(self, users=None, tweets=None, limit_per_window: int = 900, window_seconds: int = 900):
+        self.headers = {}
+        self.users = users or {}
+        self.tweets = tweets or {}
+        self.limit_per_window = limit_per_window
+        self.window_seconds = window_seconds
+        self.calls = []
+        self._windows = {}
+
+    def get(self, url, params=None, timeout=None):
+        path = url.split("/2", 1)[-1]
+        self.calls.append((path, dict(params or {})))
+        endpoint = "users/by/username" if path.startswith("/users/by/username/") else "users/tweets"
+
+        window_start, used = self._windows.get(endpoint, (time.time(), 0))
+        if time.time() - window_start >= self.window_seconds:
+            window_start, used = time.time(), 0
+        headers = {"x-rate-limit-reset": str(int(window_start + self.window_seconds))}
+        if used >= self.limit_per_window:
+            headers["x-rate-limit-remaining"] = "0"
+            return FakeTwitterResponse(429, {"title": "Too Many Requests"}, headers)
+        self._windows[endpoint] = (window_start, used + 1)
+        headers["x-rate-limit-remaining"] = str(self.limit_per_window - used - 1)
+
+        if endpoint == "users/by/username":
+            username = path.rsplit("/", 1)[-1]
+            if username not in self.users:
+                return FakeTwitterResponse(200, {"errors": [{"detail": f"Could not find user: {username}"}]}, headers)
+            return FakeTwitterResponse(200, {"data": {"id": self.users[username], "username": username}}, headers)
+
+        user_id = path.split("/")[2]
+        params = params or {}
+        tweets = self.tweets.get(user_id, [])
+        if params.get("since_id"):
+            tweets = [t for t in tweets if int(t["id"]) > int(params["since_id"])]
+        start = int(params.get("pagination_token") or 0)
+        end = start + int(params.get("max_results", 10))
+        page = tweets[start:end]
+        payload = {"data": page, "meta": {"result_count": len(page)}} if page else {"meta": {"result_count": 0}}
+        if end < len(tweets):
+            payload["meta"]["next_token"] = str(end)
+        return FakeTwitterResponse(200, payload, headers)
@@ -0,0 +1,13 @@
+from decimal import Decimal
+
+
+# DynamoDB rejects Python floats, so numbers are stored as Decimal
+def convert_floats_to_decimal(obj):
+    if isinstance(obj, float):
+        return Decimal(str(obj))
+    elif isinstance(obj, list):
+        return [convert_floats_to_decimal(i) for i in obj]
+    elif isinstance(obj, dict):
+        return {k: convert_floats_to_decimal(v) for k, v in obj.items()}
+    else:
+        return obj
@@ -77,6 +77,18 @@ def increment_goal_progress(user_id: str, goal_id: str, increment: int = 1, comp
     return "👍 Progress updated."
 
 
+# 🔑 Phrases that count as progress towards each goal type
+GOAL_PROGRESS_PHRASES = {
+    "reduce_stress": ["calm", "relaxed", "less stressed", "not anxious", "better now"],
+    "improve_sleep": ["slept well", "good sleep", "went to bed early", "consistent sleep", "slept early", "deep sleep"],
+    "boost_social": ["talked", "call", "met", "friend", "hangout", "socialized", "messaged"],
+    "improve_focus": ["focused", "concentrated", "productive", "avoided distractions"],
+}
+
+def mentions_goal_progress(goal_type: str, user_input_lower: str) -> bool:
+    return any(phrase in user_input_lower for phrase in GOAL_PROGRESS_PHRASES.get(goal_type, []))
+
+
 # 🧠 Match goal types to logic handlers
 def get_goal_response(user_input: str, goal):
     goal_type = goal.get("goal_type")
@@ -85,7 +97,7 @@ def get_goal_response(user_input: str, goal):
     user_input_lower = user_input.lower()
 
     if goal_type == "reduce_stress":
-        if any(phrase in user_input_lower for phrase in ["calm", "relaxed", "less stressed", "not anxious", "better now"]):
+        if mentions_goal_progress(goal_type, user_input_lower):
             result = increment_goal_progress(user_id, goal_id)
             if result == "🎉 Goal completed!":
                 complete_goal(user_id, goal_type)
@@ -93,7 +105,7 @@ def get_goal_response(user_input: str, goal):
         return "Feeling stressed lately? Let’s try a short breathing exercise 🌬️", True
 
     elif goal_type == "improve_sleep":
-        if any(phrase in user_input_lower for phrase in ["slept well", "good sleep", "went to bed early", "consistent sleep", "slept early", "deep sleep"]):
+        if mentions_goal_progress(goal_type, user_input_lower):
             result = increment_goal_progress(user_id, goal_id)
             if result == "🎉 Goal completed!":
                 complete_goal(user_id, goal_type)
@@ -101,7 +113,7 @@ def get_goal_response(user_input: str, goal):
         return "Sleep is crucial for your well-being. Did you sleep well recently?", True
 
     elif goal_type == "boost_social":
-        if any(word in user_input_lower for word in ["talked", "call", "met", "friend", "hangout", "socialized", "messaged"]):
+        if mentions_goal_progress(goal_type, user_input_lower):
             result = increment_goal_progress(user_id, goal_id)
             if result == "🎉 Goal completed!":
                 complete_goal(user_id, goal_type)
@@ -109,7 +121,7 @@ def get_goal_response(user_input: str, goal):
         return "Have you had any meaningful conversations or social time lately?", True
 
     elif goal_type == "improve_focus":
-        if any(word in user_input_lower for word in ["focused", "concentrated", "productive", "avoided distractions"]):
+        if mentions_goal_progress(goal_type, user_input_lower):
             result = increment_goal_progress(user_id, goal_id)
             if result == "🎉 Goal completed!":
                 complete_goal(user_id, goal_type)
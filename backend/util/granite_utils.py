@@ -0,0 +1,131 @@
+import re
+
+HARM_RE = re.compile(r"<harm>(.*?)</harm>")
+CONFIDENCE_RE = re.compile(r"<confidence>(.*?)</confidence>")
+COMMENT_RE = re.compile(r"<comment>(.*?)</comment>")
+
+
+def parse_risk_xml(generated_text: str):
+    """Pull the <harm>, <confidence> and <comment> fields out of a Granite risk evaluation.
+
+    Missing fields come back as None so callers can apply their own defaults.
+    """
+    harm = HARM_RE.search(generated_text)
+    confidence = CONFIDENCE_RE.search(generated_text)
+    comment = COMMENT_RE.search(generated_text)
+    return {
+        "harm": harm.group(1).strip() if harm else None,
+        "confidence": confidence.group(1).strip() if confidence else None,
+        "comment": comment.group(1).strip() if comment else None,
+    }
+
+
+RESULT_RE = re.compile(r'<result id="?(\d+)"?>(.*?)</result>', re.DOTALL)
+
+RISK_PROMPT = """
+    <risk_evaluation>
+    <text>{text}</text>
+
+    Analyze this text for emotional or psychological risk. Respond using structured XML format:
+
+    <harm>[Yes or No]</harm>
+    <confidence>[Numeric probability between 0.0 (no risk) and 1.0 (high risk)]</confidence>
+    <comment>[Brief reason why the risk was assessed]</comment>
+
+    Your confidence score should directly reflect the probability of risk based on language, tone, and context.
+    </risk_evaluation>
+    """
+
+BATCH_RISK_PROMPT = """
+    <risk_evaluation_batch>
+    {items}
+
+    Analyze each item separately for emotional or psychological risk. Respond with exactly one result
+    block per item, in the same order, using structured XML format:
+
+    <result id="[item id]">
+    <harm>[Yes or No]</harm>
+    <confidence>[Numeric probability between 0.0 (no risk) and 1.0 (high risk)]</confidence>
+    <comment>[Brief reason why the risk was assessed]</comment>
+    </result>
+
+    Each confidence score should directly reflect the probability of risk based on that item's language, tone, and context.
+    </risk_evaluation_batch>
+    """
+
+
+def build_risk_prompt(text: str) -> str:
+    return RISK_PROMPT.format(text=text)
+
+
+def build_batch_risk_prompt(texts) -> str:
+    items = "\n    ".join(f'<item id="{i}">{text}</item>' for i, text in enumerate(texts, start=1))
+    return BATCH_RISK_PROMPT.format(items=items)
+
+
+def is_complete_risk(parsed) -> bool:
+    try:
+        return parsed["harm"] is not None and 0.0 <= float(parsed["confidence"]) <= 1.0
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_batch_risk_xml(generated_text: str, n_items: int):
+    """Split a batch evaluation into per-item results; items without a complete result are None."""
+    results = [None] * n_items
+    for item_id, body in RESULT_RE.findall(generated_text):
+        index = int(item_id) - 1
+        if 0 <= index < n_items and results[index] is None:
+            parsed = parse_risk_xml(body)
+            if is_complete_risk(parsed):
+                results[index] = parsed
+    return results
+
+
+def generated_texts(response):
+    # generate() returns a dict for one prompt and a list of dicts for a list of prompts
+    responses = response if isinstance(response, list) else [response]
+    return [r["results"][0]["generated_text"] for r in responses]
+
+
+def score_risk_batch(model, texts, batch_size: int = 8, concurrency: int = 4, tokens_per_item: int = 80):
+    """Risk-score many texts with a few multi-item generate calls.
+
+    Texts are grouped `batch_size` to a prompt and the prompts go out as one list
+    (`concurrency` at a time). Items whose result is missing or malformed are
+    re-scored one by one. Returns one parse_risk_xml dict per text, or None where
+    the model could not be reached.
+    """
+    texts = list(texts)
+    results = [None] * len(texts)
+    groups = [list(range(start, min(start + batch_size, len(texts)))) for start in range(0, len(texts), batch_size)]
+    multi = [group for group in groups if len(group) > 1]
+    retry = [group[0] for group in groups if len(group) == 1]
+
+    if multi:
+        prompts = [build_batch_risk_prompt([texts[i] for i in group]) for group in multi]
+        params = {"decoding_method": "greedy", "max_new_tokens": tokens_per_item * batch_size}
+        try:
+            outputs = generated_texts(model.generate(prompt=prompts, params=params, concurrency_limit=concurrency))
+        except Exception as e:
+            print("⚠️ Batch risk scoring failed, falling back to single items:", e)
+            outputs = [""] * len(multi)
+        for group, output in zip(multi, outputs):
+            for i, parsed in zip(group, parse_batch_risk_xml(output, len(group))):
+                if parsed is None:
+                    retry.append(i)
+                else:
+                    results[i] = parsed
+
+    if retry:
+        retry.sort()
+        prompts = [build_risk_prompt(texts[i]) for i in retry]
+        try:
+            outputs = generated_texts(model.generate(prompt=prompts, concurrency_limit=concurrency))
+        except Exception as e:
+            print("⚠️ Risk scoring failed:", e)
+            return results
+        for i, output in zip(retry, outputs):
+            results[i] = parse_risk_xml(output)
+
+    return results
@@ -0,0 +1,62 @@
+import re
+import struct
+
+# Packed layout (little endian):
+#   b"WE" version:u8 | n_labels:u8 | n_labels x (len:u8, utf-8 label)
+#   n_words:u32 | codes:u8[n] | scores:f16[n] | starts:u32[n] | lengths:u16[n]
+# Word text is not stored; starts/lengths point back into the journal text.
+MAGIC = b"WE"
+VERSION = 1
+
+_TOKEN = re.compile(r"\S+")
+
+
+def pack_word_emotions(text: str, word_emotions) -> bytes:
+    spans = [(m.start(), m.end() - m.start()) for m in _TOKEN.finditer(text)]
+    if len(spans) != len(word_emotions):
+        raise ValueError(f"{len(word_emotions)} word emotions for {len(spans)} tokens")
+
+    labels = list(dict.fromkeys(w["emotion"] for w in word_emotions))
+    if len(labels) > 255:
+        raise ValueError("Too many distinct emotion labels to pack")
+    codes = {label: i for i, label in enumerate(labels)}
+
+    n = len(word_emotions)
+    parts = [MAGIC, struct.pack("<BB", VERSION, len(labels))]
+    for label in labels:
+        encoded = label.encode("utf-8")
+        parts.append(struct.pack("<B", len(encoded)) + encoded)
+    parts.append(struct.pack("<I", n))
+    parts.append(bytes(codes[w["emotion"]] for w in word_emotions))
+    parts.append(struct.pack(f"<{n}e", *(w["score"] for w in word_emotions)))
+    parts.append(struct.pack(f"<{n}I", *(start for start, _ in spans)))
+    parts.append(struct.pack(f"<{n}H", *(min(length, 0xFFFF) for _, length in spans)))
+    return b"".join(parts)
+
+
+def unpack_word_emotions(text: str, blob: bytes):
+    if blob[:2] != MAGIC or blob[2] != VERSION:
+        raise ValueError("Unknown word emotion blob format")
+
+    n_labels = blob[3]
+    offset = 4
+    labels = []
+    for _ in range(n_labels):
+        length = blob[offset]
+        labels.append(blob[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+
+    (n,) = struct.unpack_from("<I", blob, offset)
+    offset += 4
+    codes = blob[offset:offset + n]
+    offset += n
+    scores = struct.unpack_from(f"<{n}e", blob, offset)
+    offset += 2 * n
+    starts = struct.unpack_from(f"<{n}I", blob, offset)
+    offset += 4 * n
+    lengths = struct.unpack_from(f"<{n}H", blob, offset)
+
+    return [
+        {"text": text[start:start + length], "emotion": labels[code], "score": round(score, 3)}
+        for code, score, start, length in zip(codes, scores, starts, lengths)
+    ]
@@ -36,32 +36,27 @@ const AppLayout = () => {
   const hideSidebarRoutes = ['/', '/login', '/signup'];
   const showSidebar = !hideSidebarRoutes.includes(location.pathname);
 
-  // 🧠 Polling logic (force popup to remount every time)
-  useEffect(() => {
-    const fetchPopup = async () => {
-      try {
-        const res = await fetch("http://localhost:8002/api/trigger_check");
-        if (!res.ok) throw new Error("Failed to fetch");
+  // 🧠 Risk alerts are pushed over SSE; the browser reconnects and resumes on its own
+  const [riskAlert, setRiskAlert] = useState(null);
 
-        const data = await res.json();
-        if (data.show_popup) {
-          setPopupData({
-            message: data.support_message || "Keep going. You've got this 💙",
-            triggerId: Date.now()  // 👈 unique key on every poll
-          });
-        } else {
-          setPopupData(null);
-        }
-      } catch (err) {
-        console.error("🚨 Popup fetch error:", err);
-      }
+  useEffect(() => {
+    const events = new EventSource("http://localhost:8002/api/risk_events");
+    const applyState = (e) => {
+      const data = JSON.parse(e.data);
+      setRiskAlert(data.show_popup ? (data.support_message || "Keep going. You've got this 💙") : null);
     };
+    events.addEventListener("snapshot", applyState);
+    events.addEventListener("risk_popup", applyState);
+    events.addEventListener("popup_cleared", applyState);
+    events.onerror = (err) => console.error("🚨 Risk event stream error:", err);
 
-    fetchPopup(); // Run once immediately
-    const interval = setInterval(fetchPopup, 15 * 60 * 1000); // Poll every 1 min
+    return () => events.close();
+  }, []);
 
-    return () => clearInterval(interval);
-  }, [location.pathname]);
+  // Force popup to remount on every alert and page change
+  useEffect(() => {
+    setPopupData(riskAlert ? { message: riskAlert, triggerId: Date.now() } : null);
+  }, [riskAlert, location.pathname]);
 
   return (
     <div className="flex">